@@ -0,0 +1,72 @@
+import random
+
+import numpy as np
+
+from definitions import CONFIG_PATH
+from go.go_game import GoGame
+from mcts import MCTS
+from neural_network.neural_net_wrapper import NNetWrapper
+from training.interleaved_self_play_manager import InterleavedSelfPlayManager
+from training.self_play_manager import SelfPlayManager
+from utils.config_handler import ConfigHandler
+
+"""
+Debug script for interleaved self play: plays the same games with the sequential
+SelfPlayManager and with one InterleavedSelfPlayManager slot, with MCTS transpositions
+on, and compares the root statistics of every move. A root that is missing when the
+move is played means the search ran on another key and the move ignored it.
+"""
+
+
+def record_roots(manager, roots):
+    # record the visit counts of the search root each time the manager plays a move
+    play_move = manager.play_move
+
+    def recorded_play_move(pi, temp):
+        canonicalBoard = manager.go_game.getCanonicalForm(manager.board, manager.board.current_player)
+        node_id = manager.mcts.node_ids.get(manager.mcts.get_key(canonicalBoard))
+        if node_id is None:
+            roots.append(None)
+        else:
+            roots.append(manager.mcts.nodes[node_id].get_counts(manager.go_game.getActionSize()))
+        return play_move(pi, temp)
+
+    manager.play_move = recorded_play_move
+
+
+def make_manager(go_game, neural_net, roots):
+    mcts = MCTS(game=go_game, nnet=neural_net, is_self_play=True)
+    mcts.transpositions = True
+    manager = SelfPlayManager(go_game, neural_net, mcts)
+    record_roots(manager, roots)
+    return manager
+
+
+if __name__ == "__main__":
+    config = ConfigHandler(CONFIG_PATH)
+    go_game = GoGame(config['board_size'], use_bitboard=config['use_bitboard'],
+                     enforce_superko=config['enforce_superko'],
+                     ladder_features=config['use_ladder_features'])
+    neural_net = NNetWrapper(go_game, config)
+    num_games = 2
+
+    random.seed(0)
+    np.random.seed(0)
+    sequential_roots = []
+    manager = make_manager(go_game, neural_net, sequential_roots)
+    for _ in range(num_games):
+        manager.execute_game()
+
+    random.seed(0)
+    np.random.seed(0)
+    interleaved_roots = []
+    interleaved = InterleavedSelfPlayManager(go_game, neural_net)
+    interleaved.managers = [make_manager(go_game, neural_net, interleaved_roots)]
+    interleaved.execute_games(num_games)
+
+    for roots in (sequential_roots, interleaved_roots):
+        missing = sum(1 for counts in roots if counts is None)
+        print(f"Root hits: {len(roots) - missing}, misses: {missing}")
+    same = len(sequential_roots) == len(interleaved_roots) and all(
+        a is not None and b is not None and np.array_equal(a, b) for a, b in zip(sequential_roots, interleaved_roots))
+    print(f"Same root statistics: {same}")
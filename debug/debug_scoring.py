@@ -33,6 +33,7 @@ if __name__ == "__main__":
     current_game = game_7
 
     print(f"Board Komi: {board.komi}\n")
+    positions = []
 
     while turn_count < len(current_game):
         print(f"Turn Number: {turn_count + 1}")
@@ -42,6 +43,7 @@ if __name__ == "__main__":
 
         # play the chosen move
         board = go_game.getNextState(board, current_game[turn_count])
+        positions.append(board.copy())
         start_time_tt = time.time()
         score = go_game.getScore(board.copy())
         end_time_tt = time.time()
@@ -60,4 +62,26 @@ if __name__ == "__main__":
 
         turn_count += 1
 
+    # score every position of the game at once and check it against the per move scores
+    start_time_batch = time.time()
+    batch_scores, batch_ownership = go_game.score_batch(positions)
+    elapsed_time_batch = time.time() - start_time_batch
+    mismatches = [turn + 1 for turn, position in enumerate(positions)
+                  if tuple(batch_scores[turn]) != go_game.getScore(position)]
+    print(f"Batch scoring time for {len(positions)} positions: {elapsed_time_batch} seconds")
+    print(f"Batch / per move score mismatches at turns: {mismatches}\n")
+
+    # a canonical view must score like the inverted board copy it stands for, and must not
+    # leave a wrong score for the real board in the score cache
+    view_mismatches = []
+    for turn, position in enumerate(positions):
+        go_game.score_cache.clear()
+        score = go_game.getScore(position)
+        view = go_game.getCanonicalForm(position, position.current_player)
+        view_score = go_game.getScore(view.copy())
+        go_game.score_cache.clear()
+        if go_game.getScore(view) != view_score or go_game.getScore(position) != score:
+            view_mismatches.append(turn + 1)
+    print(f"Canonical view / board copy score mismatches at turns: {view_mismatches}\n")
+
     gtp_logger.save_sgf(GameType.DEBUG)
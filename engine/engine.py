@@ -28,14 +28,11 @@ class Engine:
             self.config = ConfigHandler(f"{ROOT_DIR}/engine/engine_config.yaml")
 
         self.board_size = self.config['board_size']
-        self.go_game = GoGame(self.board_size, is_arena_game=True)
+        self.go_game = GoGame(self.board_size, is_arena_game=True, use_bitboard=self.config['use_bitboard'],
+                              enforce_superko=self.config['enforce_superko'],
+                              ladder_features=self.config['use_ladder_features'])
         self.board = self.go_game.getInitBoard()
-        self.x_boards, self.y_boards = self.go_game.init_x_y_boards()
-        self.c_boards = [np.ones((7, 7)), np.zeros((7, 7))]
-        self._set_player_board()
         self.canonicalBoard = self.go_game.getCanonicalForm(self.board, self.board.current_player)
-        self.canonicalHistory = self.go_game.getCanonicalHistory(self.x_boards, self.y_boards, self.canonicalBoard,
-                                                                 self.player_board)
         self.neural_net = NNetWrapper(self.go_game, self.config)
 
         if is_frozen_state():
@@ -45,15 +42,6 @@ class Engine:
 
         self.mcts = MCTS(game=self.go_game, nnet=self.neural_net, is_self_play=False, config=self.config)
 
-    # set the player_board tuple based on the current player
-    def _set_player_board(self, player=None):
-        if player is None:
-            current_player = self.board.current_player
-        else:
-            current_player = player
-        self.player_board = (self.c_boards[0], self.c_boards[1]) if current_player == 1 else (
-            self.c_boards[1], self.c_boards[0])
-
     # run the command passed to the engine
     def run_command(self, command):
         if 'name' in command:
@@ -95,8 +83,11 @@ class Engine:
     # change the board size for the game
     def set_board_size(self, command):
         size = int(command.split()[-1])
-        if size in [7]:
-            self.go_game = GoGame(size, is_arena_game=True)
+        # the network is built for the configured board size
+        if size == self.config['board_size']:
+            self.go_game = GoGame(size, is_arena_game=True, use_bitboard=self.config['use_bitboard'],
+                              enforce_superko=self.config['enforce_superko'],
+                              ladder_features=self.config['use_ladder_features'])
             self.board_size = size
             self.board = self.go_game.getInitBoard()
         else:
@@ -117,17 +108,9 @@ class Engine:
 
     # execute a move given by a human or model, and update all data related to the game state
     def execute_move(self, action):
-        # make move on board
+        # make move on board, the board keeps its own history planes for the network input
         self.board = self.go_game.getNextState(self.board, action)
-        # Update histories to prepare for next move
         self.canonicalBoard = self.go_game.getCanonicalForm(self.board, self.board.current_player)
-        self._set_player_board()
-        self.canonicalHistory, self.x_boards, self.y_boards = self.go_game.getCanonicalHistory(self.x_boards,
-                                                                                               self.y_boards,
-                                                                                               self.canonicalBoard,
-                                                                                               self.player_board)
-        # player will switch, so switch x and y boards (current/opposing player histories)
-        self.x_boards, self.y_boards = self.y_boards, self.x_boards
 
     # play a move given by a human
     def play(self, command):
@@ -143,11 +126,9 @@ class Engine:
     def generate_move(self):
         # prepare necessary data structures for the move
         self.canonicalBoard = self.go_game.getCanonicalForm(self.board, self.board.current_player)
-        self._set_player_board()
         # generate a move based on most recent board state
         action = np.argmax(
-            self.mcts.getActionProb(self.board, self.canonicalBoard, self.canonicalHistory, self.x_boards,
-                                    self.y_boards, self.player_board, self.config["num_full_search_sims"], temp=0))
+            self.mcts.getActionProb(self.board, self.canonicalBoard, self.config["num_full_search_sims"], temp=0))
         # perform the move
         self.execute_move(action)
         # print the GTP coordinate of the move
@@ -156,9 +137,13 @@ class Engine:
 
     # translate an action (int) to the corresponding GTP coordinate (str)
     def _action_to_gtp_coordinate(self, action):
-        row = self.config["board_size"] - int(action / self.config["board_size"])
+        position = self.go_game.geometry.to_position(action)
+        if position is None:
+            return "pass"
+        (x, y) = position
+        row = self.config["board_size"] - x
         col_coords = ['A', 'B', 'C', 'D', 'E', 'F', 'G', 'H', 'I', 'J', 'K', 'L', 'M', 'N', 'O', 'P']
-        col = col_coords[action % 7]
+        col = col_coords[y]
         coordinate = col + str(row)
         return coordinate
 
@@ -176,7 +161,7 @@ class Engine:
                 row = letters.index(coord[1].lower())
             except ValueError as e:
                 row = int(self.config["board_size"]) - int(coord[1])
-            action = (row * 7) + col
+            action = self.go_game.geometry.to_action((row, col))
         return action
 
     # initialize board state from an SGF file
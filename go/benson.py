@@ -0,0 +1,94 @@
+import numpy as np
+
+from go.go_logic import EMPTY
+
+'''
+Benson's algorithm for unconditional life.
+A set of blocks (maximal groups) of one color is unconditionally alive, or
+pass-alive, if the opponent cannot capture any of them even when the owner
+passes every turn. Starting from all blocks of the color and all regions
+(maximal connected sets of points not of that color), repeat until stable:
+  - drop the blocks that have fewer than 2 vital regions left, a region being
+    vital to a block if all of its empty points are liberties of the block
+  - drop the regions that border a dropped block
+The blocks left are unconditionally alive. The regions left that are vital
+to one of them are safe territory: every empty point of such a region touches
+the alive block, so the opponent can never make an eye (or live) there.
+Colors are the values of board.pieces, like the rest of the scoring code.
+'''
+
+
+def unconditional_life(board, color):
+    """Run Benson's algorithm for the stones of value `color` in board.pieces.
+    Returns (alive, territory), boolean arrays over the flattened board: alive marks
+    the stones of the unconditionally alive blocks, territory the points of the
+    regions they safely enclose (empty points and opponent stones)
+    """
+    n = board.n
+    nn = n * n
+    flat = board.pieces.ravel()
+    neighbor_points = board.geometry.neighbor_points
+
+    # blocks of `color` and their liberties, read from the board's group structures
+    block_of = [-1] * nn
+    block_points = []
+    block_liberties = []
+    for p in np.flatnonzero(flat == color).tolist():
+        if block_of[p] >= 0:
+            continue
+        position = (p // n, p % n)
+        points = [x * n + y for (x, y) in board.get_group(position)]
+        for q in points:
+            block_of[q] = len(block_points)
+        block_points.append(points)
+        block_liberties.append(set(x * n + y for (x, y) in board.get_liberties(position)))
+
+    # regions: connected components of the points that are not `color`
+    is_region = (flat != color).tolist()
+    is_empty = (flat == EMPTY).tolist()
+    region_of = [-1] * nn
+    region_points = []
+    region_blocks = []
+    region_vital_to = []
+    for p in np.flatnonzero(flat != color).tolist():
+        if region_of[p] >= 0:
+            continue
+        r = len(region_points)
+        region_of[p] = r
+        points = [p]
+        bordering = set()
+        frontier = [p]
+        while frontier:
+            for q in neighbor_points[frontier.pop()]:
+                if not is_region[q]:
+                    bordering.add(block_of[q])
+                elif region_of[q] < 0:
+                    region_of[q] = r
+                    points.append(q)
+                    frontier.append(q)
+        empty_points = set(q for q in points if is_empty[q])
+        region_points.append(points)
+        region_blocks.append(bordering)
+        region_vital_to.append(set(b for b in bordering if empty_points <= block_liberties[b]))
+
+    alive_blocks = set(range(len(block_points)))
+    regions = set(range(len(region_points)))
+    while True:
+        vital_count = [0] * len(block_points)
+        for r in regions:
+            for b in region_vital_to[r]:
+                vital_count[b] += 1
+        dropped = set(b for b in alive_blocks if vital_count[b] < 2)
+        if not dropped:
+            break
+        alive_blocks -= dropped
+        regions = set(r for r in regions if region_blocks[r] <= alive_blocks)
+
+    alive = np.zeros(nn, dtype=bool)
+    for b in alive_blocks:
+        alive[block_points[b]] = True
+    territory = np.zeros(nn, dtype=bool)
+    for r in regions:
+        if region_vital_to[r] & alive_blocks:
+            territory[region_points[r]] = True
+    return alive, territory
@@ -0,0 +1,311 @@
+import numpy as np
+
+from go.go_logic import Board, IllegalMove, BLACK, WHITE, EMPTY, PASS_MOVE, BORDERS_BLACK, BORDERS_WHITE
+
+'''
+BitBoard class.
+Same interface as Board, but the stones of each color are kept as a single
+python int used as a bitboard: bit (x * n + y) is set if (x, y) holds a stone
+of that color. A 7x7 board fits in 49 bits.
+Groups, liberties, captures, suicide and ko are computed with shifts and masks
+instead of the per-cell liberty/group sets used by Board. `pieces` is still
+kept up to date so scoring, the network input and display work unchanged.
+'''
+
+
+class BitBoard(Board):
+    # Shared masks per board size, {boardsize: (full, not_first_col, not_last_col)}
+    __MASKS_CACHE = {}
+    # Shared neighbor tables per board size, {boardsize: ([neighbor mask], [[neighbor index]])}
+    __POINT_NEIGHBORS_CACHE = {}
+
+    def _init_groups(self):
+        self._create_masks()
+        self.stones = {BLACK: 0, WHITE: 0}
+
+    def _create_masks(self):
+        n = self.n
+        if n not in BitBoard.__MASKS_CACHE:
+            full = (1 << (n * n)) - 1
+            first_col = 0
+            last_col = 0
+            for x in range(n):
+                first_col |= 1 << (x * n)
+                last_col |= 1 << (x * n + n - 1)
+            BitBoard.__MASKS_CACHE[n] = (full, full & ~first_col, full & ~last_col)
+
+            neighbor_masks = []
+            # same order as Board._neighbors so captures are processed identically
+            neighbor_points = self.geometry.neighbor_points
+            for points in neighbor_points:
+                mask = 0
+                for p in points:
+                    mask |= 1 << p
+                neighbor_masks.append(mask)
+            BitBoard.__POINT_NEIGHBORS_CACHE[n] = (neighbor_masks, neighbor_points)
+
+        self._full, self._not_first_col, self._not_last_col = BitBoard.__MASKS_CACHE[n]
+        self._num_bytes = (n * n + 7) // 8
+        self._neighbor_masks, self._neighbor_points = BitBoard.__POINT_NEIGHBORS_CACHE[n]
+
+    def _empty_bits(self):
+        return self._full & ~(self.stones[BLACK] | self.stones[WHITE])
+
+    def _expand(self, bits):
+        """Return the set of points orthogonally adjacent to any point in `bits`
+        """
+        n = self.n
+        return (((bits & self._not_last_col) << 1) | ((bits & self._not_first_col) >> 1) |
+                (bits << n) | (bits >> n)) & self._full
+
+    def _flood(self, seed, mask):
+        """Grow `seed` through the connected points of `mask`
+        """
+        group = seed
+        while True:
+            grown = (group | self._expand(group)) & mask
+            if grown == group:
+                return group
+            group = grown
+
+    def _bits_to_positions(self, bits):
+        positions = set()
+        n = self.n
+        while bits:
+            low = bits & -bits
+            p = low.bit_length() - 1
+            positions.add((p // n, p % n))
+            bits ^= low
+        return positions
+
+    def _bits_to_mask(self, bits):
+        """Boolean array over the flattened board of the points set in `bits`
+        """
+        return np.unpackbits(np.frombuffer(bits.to_bytes(self._num_bytes, 'little'), dtype=np.uint8),
+                             bitorder='little')[:self.n * self.n].astype(bool)
+
+    def _group_bits(self, position):
+        (x, y) = position
+        bit = 1 << int(x * self.n + y)
+        for color in (BLACK, WHITE):
+            if self.stones[color] & bit:
+                return self._flood(bit, self.stones[color])
+        return 0
+
+    def get_group(self, position):
+        return self._bits_to_positions(self._group_bits(position))
+
+    def get_liberties(self, position):
+        (x, y) = position
+        p = int(x * self.n + y)
+        group = self._group_bits(position)
+        if group == 0:
+            return self._bits_to_positions(self._neighbor_masks[p] & self._empty_bits())
+        return self._bits_to_positions(self._expand(group) & self._empty_bits())
+
+    def get_groups_around(self, position):
+        groups = []
+        seen = 0
+        (x, y) = position
+        for q in self._neighbor_points[x * self.n + y]:
+            bit = 1 << q
+            if bit & seen:
+                continue
+            group = self._group_bits((q // self.n, q % self.n))
+            if group:
+                seen |= group
+                groups.append(self._bits_to_positions(group))
+        return groups
+
+    def is_suicide(self, action, color):
+        (x, y) = action
+        p = int(x * self.n + y)
+        bit = 1 << p
+        empty = self._empty_bits()
+        if self._neighbor_masks[p] & empty:
+            return False
+        own = self.stones[color]
+        opp = self.stones[-color]
+        for q in self._neighbor_points[p]:
+            q_bit = 1 << q
+            if own & q_bit:
+                # saved by attaching to a friendly group with liberties elsewhere
+                if self._expand(self._flood(q_bit, own)) & empty & ~bit:
+                    return False
+            elif opp & q_bit:
+                # saved by capturing an enemy group whose last liberty is here
+                if not (self._expand(self._flood(q_bit, opp)) & empty & ~bit):
+                    return False
+        return True
+
+    def is_legal(self, action, color):
+        # passing is always legal
+        if action is PASS_MOVE:
+            return True
+        if not self._on_board(action):
+            return False
+        (x, y) = action
+        if (self.stones[BLACK] | self.stones[WHITE]) & (1 << int(x * self.n + y)):
+            return False
+        if action == self.ko:
+            return False
+        if self.is_suicide(action, color):
+            return False
+        if self.enforce_superko and self.is_positional_superko(action, color):
+            return False
+        return True
+
+    def _legal_points(self, color):
+        empty = self._empty_bits()
+        # points with an empty neighbor are never suicide
+        legal = empty & self._expand(empty)
+        # liberties of friendly groups with two or more liberties, and the last
+        # liberty of enemy groups in atari
+        for (stones, saves) in ((self.stones[color], lambda count: count > 1),
+                                (self.stones[-color], lambda count: count == 1)):
+            while stones:
+                group = self._flood(stones & -stones, stones)
+                stones &= ~group
+                liberties = self._expand(group) & empty
+                if saves(liberties.bit_count()):
+                    legal |= liberties
+        legal &= empty
+        return self._filter_ko(self._bits_to_mask(legal), color)
+
+    def _group_liberties(self, color, num_liberties):
+        empty = self._empty_bits()
+        stones = self.stones[color]
+        points = 0
+        while stones:
+            group = self._flood(stones & -stones, stones)
+            stones &= ~group
+            liberties = self._expand(group) & empty
+            if liberties.bit_count() == num_liberties:
+                points |= liberties
+        return self._bits_to_positions(points)
+
+    def get_region_borders(self):
+        # flood each empty region and test its outline against both colors
+        empty = self._empty_bits()
+        remaining = empty
+        reached = {BORDERS_BLACK: 0, BORDERS_WHITE: 0}
+        while remaining:
+            region = self._flood(remaining & -remaining, empty)
+            remaining &= ~region
+            outline = self._expand(region)
+            if outline & self.stones[BLACK]:
+                reached[BORDERS_BLACK] |= region
+            if outline & self.stones[WHITE]:
+                reached[BORDERS_WHITE] |= region
+        return (self._bits_to_mask(reached[BORDERS_BLACK]) * BORDERS_BLACK +
+                self._bits_to_mask(reached[BORDERS_WHITE]) * BORDERS_WHITE).astype(np.int8)
+
+    def has_legal_moves(self, color):
+        empty = self._empty_bits()
+        n = self.n
+        while empty:
+            low = empty & -empty
+            p = low.bit_length() - 1
+            empty ^= low
+            if self.is_legal((p // n, p % n), color):
+                return True
+        return False
+
+    def _captured_bits(self, p, color):
+        """Return the opponent stones that would be captured if color played at point p
+        """
+        bit = 1 << p
+        opp = self.stones[-color]
+        empty = self._empty_bits() & ~bit
+        captured = 0
+        for q in self._neighbor_points[p]:
+            q_bit = 1 << q
+            if opp & q_bit and not captured & q_bit:
+                group = self._flood(q_bit, opp)
+                if not self._expand(group) & empty:
+                    captured |= group
+        return captured
+
+    def _captured_groups(self, action, color):
+        (x, y) = action
+        captured = self._captured_bits(int(x * self.n + y), color)
+        return [self._bits_to_positions(captured)] if captured else []
+
+    def _remove_bits(self, bits, color):
+        """Take the stones in `bits` off the board, returns their positions
+        """
+        self.stones[color] &= ~bits
+        positions = self._bits_to_positions(bits)
+        for (x, y) in positions:
+            self._update_hash((x, y), color)
+            self.pieces[x, y] = EMPTY
+        return positions
+
+    def invert_colors(self):
+        super().invert_colors()
+        self.stones = {BLACK: self.stones[WHITE], WHITE: self.stones[BLACK]}
+
+    def copy(self):
+        other = BitBoard(self.n)
+        other.pieces = self.pieces.copy()
+        other.stones = dict(self.stones)
+        other.ko = self.ko
+        other.handicaps = list(self.handicaps)
+        other.history = list(self.history)
+        other.num_black_prisoners = self.num_black_prisoners
+        other.num_white_prisoners = self.num_white_prisoners
+        other.passes_black = self.passes_black
+        other.passes_white = self.passes_white
+        other.stone_ages = self.stone_ages.copy()
+        other.enforce_superko = self.enforce_superko
+        other._hash_color_sign = self._hash_color_sign
+        other.position_hash = self.position_hash
+        other.current_hash = self.current_hash
+        other.history_hash = self.history_hash
+        other.previous_hashes = set(self.previous_hashes)
+        other.position_hashes = list(self.position_hashes)
+        other.features = self.features.copy()
+        other.ladder_features = self.ladder_features
+        other._ladder_cache = self._ladder_cache
+        other.current_player = self.current_player
+        return other
+
+    def _place_stone(self, action, color):
+        (x, y) = action
+        # plain ints, numpy integers would overflow on boards larger than 8x8
+        p = int(x * self.n + y)
+        bit = 1 << p
+        self.pieces[x][y] = color
+        self.stones[color] |= bit
+        self._update_hash(action, color)
+
+        captured_groups = []
+        # check neighboring groups' liberties for captures, in the same
+        # order (and with the same ko bookkeeping) as Board._place_stone
+        for q in self._neighbor_points[p]:
+            q_bit = 1 << q
+            opp = self.stones[-color]
+            if not opp & q_bit:
+                continue
+            captured = self._flood(q_bit, opp)
+            if self._expand(captured) & self._empty_bits():
+                continue
+            # capture occurred!
+            captured_groups.append(self._remove_bits(captured, -color))
+            # check for ko
+            if captured == q_bit:
+                own_group = self._flood(bit, self.stones[color])
+                would_recapture = (self._expand(own_group) & self._empty_bits()).bit_count() == 1
+                recapture_size_is_1 = own_group == bit
+                if would_recapture and recapture_size_is_1:
+                    self.ko = (q // self.n, q % self.n)
+        return captured_groups
+
+    def _unplace_stone(self, action, color, captured_groups):
+        (x, y) = action
+        self.pieces[x][y] = EMPTY
+        self.stones[color] &= ~(1 << int(x * self.n + y))
+        for group in captured_groups:
+            for (gx, gy) in group:
+                self.pieces[gx][gy] = -color
+                self.stones[-color] |= 1 << (gx * self.n + gy)
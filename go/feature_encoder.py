@@ -0,0 +1,97 @@
+import numpy as np
+
+'''
+FeatureEncoder class.
+Builds the 19 x N x N network input of a board:
+  - planes 0-15: the current/opposing player's stones for the last 8 positions,
+    newest first (own stones, opposing stones, own stones one move ago, ...)
+  - plane 16: the 'sensibility layer' (legal moves that do not fill an own eye)
+  - planes 17-18: the current/opposing player (all 1s for black, all 0s for white)
+  - optionally more planes appended after them (the ladder planes, see Board.get_features)
+The last 8 positions are kept in a ring buffer of absolute color frames
+(black stones, white stones), so playing a move only writes the newest frame.
+The planes are assembled into one preallocated float32 array with a single
+gather when the network input is requested.
+'''
+HISTORY_LENGTH = 8
+NUM_PLANES = 2 * HISTORY_LENGTH + 3
+# ladder capture and ladder escape planes, appended when ladder features are enabled
+NUM_LADDER_PLANES = 2
+
+
+class FeatureEncoder:
+    # Gather indexes from the flattened ring (frame * 2 + color) to the 16 history
+    # planes, {history length: int array (head, current player index, plane)}
+    __GATHER_CACHE = {}
+
+    def __init__(self, n, history_length=HISTORY_LENGTH):
+        self.n = n
+        self.history_length = history_length
+        # frames[i] = (black stones, white stones) of a past position, frames[head] is the newest
+        self.frames = np.zeros((history_length, 2, n, n), dtype=np.float32)
+        self.head = 0
+        # output buffer, allocated by the first encode() so board copies that are
+        # never fed to the network do not pay for it
+        self.planes = None
+        self._create_gather_index()
+
+    def _create_gather_index(self):
+        length = self.history_length
+        if length not in FeatureEncoder.__GATHER_CACHE:
+            index = np.zeros((length, 2, 2 * length), dtype=np.intp)
+            for head in range(length):
+                for own in range(2):
+                    for k in range(length):
+                        frame = (head - k) % length
+                        index[head, own, 2 * k] = frame * 2 + own
+                        index[head, own, 2 * k + 1] = frame * 2 + 1 - own
+            FeatureEncoder.__GATHER_CACHE[length] = index
+        self._gather_index = FeatureEncoder.__GATHER_CACHE[length]
+
+    def push(self, pieces, black=1):
+        """Record the position `pieces` as the newest frame. `black` is the value
+        black stones have in `pieces` (-1 on a board with inverted colors).
+        Returns the frame that was dropped, pass it to pop() to take the push back
+        """
+        self.head = (self.head + 1) % self.history_length
+        frame = self.frames[self.head]
+        evicted = frame.copy()
+        np.equal(pieces, black, out=frame[0], casting='unsafe')
+        np.equal(pieces, -black, out=frame[1], casting='unsafe')
+        return evicted
+
+    def pop(self, evicted):
+        self.frames[self.head] = evicted
+        self.head = (self.head - 1) % self.history_length
+
+    def encode(self, current_player, sensibility, extra_planes=None):
+        """Fill and return the (19, n, n) float32 input for `current_player`,
+        followed by `extra_planes` if given. The array is reused by the next call,
+        copy it to keep it
+        """
+        num_planes = 2 * self.history_length + 3
+        if extra_planes is not None:
+            num_planes += len(extra_planes)
+        if self.planes is None or len(self.planes) != num_planes:
+            self.planes = np.zeros((num_planes, self.n, self.n), dtype=np.float32)
+        planes = self.planes
+        own = 0 if current_player == 1 else 1
+        history = 2 * self.history_length
+        np.take(self.frames.reshape(-1, self.n, self.n), self._gather_index[self.head, own],
+                axis=0, out=planes[:history])
+        planes[history] = sensibility
+        planes[history + 1].fill(1 - own)
+        planes[history + 2].fill(own)
+        if extra_planes is not None:
+            planes[history + 3:] = extra_planes
+        return planes
+
+    def copy(self):
+        other = FeatureEncoder.__new__(FeatureEncoder)
+        other.n = self.n
+        other.history_length = self.history_length
+        other.frames = self.frames.copy()
+        other.head = self.head
+        other.planes = None
+        other._gather_index = self._gather_index
+        return other
@@ -0,0 +1,111 @@
+import numpy as np
+
+'''
+Geometry class.
+Everything about an n x n board that only depends on its size, computed once
+per size and shared by every Board, GoGame, MCTS and engine of that size.
+Points are addressed either as (x, y) tuples or as flat indexes x * n + y,
+the flat index n * n stands for "off the board" in the padded index arrays
+and for the pass action in the action tables.
+'''
+
+
+# Shared geometries {boardsize: Geometry}, see get_geometry
+_GEOMETRY_CACHE = {}
+
+
+class Geometry:
+    def __init__(self, n):
+        self.n = n
+        self.num_points = n * n
+        # the pass action, also the off-board index of the padded arrays
+        self.pass_action = n * n
+        self.last = n - 1
+
+        # action <-> coordinate tables, action_to_coord[pass_action] is None
+        self.action_to_coord = [(a // n, a % n) for a in range(n * n)] + [None]
+        self.coord_to_action = np.arange(n * n, dtype=np.intp).reshape(n, n)
+
+        # neighbors and diagonals of each point as lists of (x, y), the orders are the
+        # ones the group bookkeeping and is_eye have always used
+        self.neighbors = {}
+        self.diagonals = {}
+        for x in range(n):
+            for y in range(n):
+                self.neighbors[(x, y)] = [xy for xy in [(x - 1, y), (x + 1, y), (x, y - 1), (x, y + 1)]
+                                          if self.on_board(xy)]
+                self.diagonals[(x, y)] = [xy for xy in [(x - 1, y - 1), (x + 1, y + 1), (x + 1, y - 1), (x - 1, y + 1)]
+                                          if self.on_board(xy)]
+        # the same as flat indexes, one list per point
+        self.neighbor_points = [[nx * n + ny for (nx, ny) in self.neighbors[coord]]
+                                for coord in self.action_to_coord[:-1]]
+        self.diagonal_points = [[dx * n + dy for (dx, dy) in self.diagonals[coord]]
+                                for coord in self.action_to_coord[:-1]]
+
+        # flat neighbor indexes padded to 4 columns with the off-board index,
+        # int array (n * n, 4)
+        self.neighbor_index = np.full((n * n, 4), n * n, dtype=np.intp)
+        for p, points in enumerate(self.neighbor_points):
+            self.neighbor_index[p, :len(points)] = points
+        # flat indexes of the 8 points around each point (4 orthogonal then 4 diagonal),
+        # off-board index where the point is on the edge, int array (n * n, 8)
+        offsets = [(-1, 0), (1, 0), (0, -1), (0, 1), (-1, -1), (-1, 1), (1, -1), (1, 1)]
+        self.surround_index = np.full((n * n, 8), n * n, dtype=np.intp)
+        for p, (x, y) in enumerate(self.action_to_coord[:-1]):
+            for k, (dx, dy) in enumerate(offsets):
+                if self.on_board((x + dx, y + dy)):
+                    self.surround_index[p, k] = (x + dx) * n + y + dy
+
+        # edge masks over the flattened board
+        self.num_neighbors = np.array([len(points) for points in self.neighbor_points], dtype=np.intp)
+        self.edge_mask = self.num_neighbors < 4
+        self.corner_mask = self.num_neighbors < 3
+
+        # index permutations of the 8 board symmetries over the n * n points plus pass.
+        # Symmetry r rotates by r % 4 quarter turns (np.rot90) and then mirrors (np.fliplr)
+        # if r >= 4. For a flattened plane or policy x, x[symmetries[r]] is its transform
+        # and y[inverse_symmetries[r]] undoes it
+        points = np.arange(n * n).reshape(n, n)
+        self.symmetries = np.zeros((8, n * n + 1), dtype=np.intp)
+        for r in range(8):
+            transformed = np.rot90(points, r % 4)
+            if r >= 4:
+                transformed = np.fliplr(transformed)
+            self.symmetries[r, :-1] = transformed.ravel()
+            self.symmetries[r, -1] = n * n
+        self.inverse_symmetries = np.argsort(self.symmetries, axis=1)
+
+        for table in (self.coord_to_action, self.neighbor_index, self.surround_index, self.num_neighbors,
+                      self.edge_mask, self.corner_mask, self.symmetries, self.inverse_symmetries):
+            table.flags.writeable = False
+
+    def on_board(self, position):
+        (x, y) = position
+        return 0 <= x < self.n and 0 <= y < self.n
+
+    def to_action(self, position):
+        """Action of an (x, y) position, None (a pass) maps to the pass action
+        """
+        if position is None:
+            return self.pass_action
+        return position[0] * self.n + position[1]
+
+    def to_position(self, action):
+        """(x, y) position of an action, None for the pass action
+        """
+        return self.action_to_coord[int(action)]
+
+
+def get_geometry(n):
+    """The shared Geometry of an n x n board
+    """
+    if n not in _GEOMETRY_CACHE:
+        _GEOMETRY_CACHE[n] = Geometry(n)
+    return _GEOMETRY_CACHE[n]
+
+
+def symmetry_permutations(n):
+    """(permutations, inverse permutations) of the 8 board symmetries, see Geometry
+    """
+    geometry = get_geometry(n)
+    return geometry.symmetries, geometry.inverse_symmetries
@@ -1,25 +1,54 @@
 from __future__ import print_function
 
+import math
+
 import numpy as np
 
+from go.benson import unconditional_life
+from go.bitboard_logic import BitBoard
 from go.game import Game
-from go.go_logic import Board
-from itertools import permutations
+from go.feature_encoder import NUM_PLANES, NUM_LADDER_PLANES
+from go.geometry import get_geometry
+from go.score_cache import get_score_cache
+from go.go_logic import Board, CanonicalView, IllegalMove, BORDERS_BLACK, BORDERS_WHITE
+
+# symmetries (see Geometry.symmetries) of the training examples, in order: rotations by
+# 1, 2, 3 and 4 quarter turns, each mirrored and then as is
+SYMMETRY_ORDER = [5, 1, 6, 2, 7, 3, 4, 0]
 
 
 class GoGame(Game):
 
     # TODO: should is_engine_game be a part of config.yaml instead?
     # I don't think we want to couple engine code and the GoGame class - HL
-    def __init__(self, n, is_arena_game=False):
+    def __init__(self, n, is_arena_game=False, use_bitboard=False, enforce_superko=False, ladder_features=False):
         super().__init__()
         self.n = n
+        # neighbor, action and symmetry tables of this board size
+        self.geometry = get_geometry(n)
+        # games are scored once this many moves have been played (7 x 7 x 2 = 98 on 7x7)
+        self.max_moves = 2 * n * n
         self.is_arena_game = is_arena_game
+        # use the bitboard implementation of the game logic instead of the set based one
+        self.use_bitboard = use_bitboard
+        # forbid moves that recreate an earlier position (positional superko)
+        self.enforce_superko = enforce_superko
+        # add the ladder capture/escape planes to the network input
+        self.ladder_features = ladder_features
         self.stay_alive_threshold = 0.4
+        # stones the network predicts the opponent owns by more than this are dead (see get_predicted_score)
+        self.predicted_dead_threshold = 0.5
+        # scores shared by every game in the process, see go/score_cache.py
+        self.score_cache = get_score_cache()
 
     def getInitBoard(self):
         # return initial board (numpy board)
-        b = Board(self.n)
+        if self.use_bitboard:
+            b = BitBoard(self.n)
+        else:
+            b = Board(self.n)
+        b.enforce_superko = self.enforce_superko
+        b.ladder_features = self.ladder_features
         return b
 
     def getBoardSize(self):
@@ -30,39 +59,43 @@ class GoGame(Game):
         # return number of actions
         return (self.n * self.n) + 1
 
+    def getFeaturePlanes(self):
+        # number of input planes of the network (see Board.get_features)
+        if self.ladder_features:
+            return NUM_PLANES + NUM_LADDER_PLANES
+        return NUM_PLANES
+
     def getNextState(self, board, action):
         # if player takes action on board, return next (board,player)
         # action must be a valid move
         # print("getting next state from perspect of player {} with action {}".format(player,action))
 
         b = board.copy()
-        if action == (self.n * self.n):
-            move = None
-        else:
-            move = (int(action / self.n), action % self.n)
-        b.execute_move(move, b.current_player)
+        b.execute_move(self.action_to_move(action), b.get_current_color())
 
         return b
 
+    def applyAction(self, board, action, trusted=False):
+        # play action on board in place for the current player, undo with undoAction
+        # trusted skips the legality check, use it for actions taken from getValidMoves
+        board.play(self.action_to_move(action), board.get_current_color(), trusted)
+
+    def undoAction(self, board):
+        board.undo()
+
+    def action_to_move(self, action):
+        return self.geometry.action_to_coord[int(action)]
+
     # modified
     #def getValidMoves(self, board, player, is_self_play):
     def getValidMoves(self, board):
-        # return a fixed size binary vector
-        valids = [0 for i in range(self.getActionSize())]
-        #b = board.copy()
-        legalMoves = board.get_legal_moves(board.current_player)
-        valids[-1] = 1
-
+        # return a fixed size binary vector (read-only, cached on the board until the next move)
+        allow_pass = True
         if self.is_arena_game and len(board.history) < 5:
-            valids[-1] = 0
+            allow_pass = False
         elif not self.is_arena_game and len(board.history) < 15:
-            valids[-1] = 0
-
-        if len(legalMoves) == 0:
-            return np.array(valids)
-        for x, y in legalMoves:
-            valids[self.n * x + y] = 1
-        return np.array(valids)
+            allow_pass = False
+        return board.get_legal_mask(allow_pass)
 
     def filter_valid_moves(self, valids):
         filtered = []
@@ -73,19 +106,25 @@ class GoGame(Game):
 
     # Self play games can terminate according to:
     #   - A dynamic score threshold (todo)
-    #   - A move threshold (7 x 7 x 2 = 98)
+    #   - A move threshold (max_moves, 7 x 7 x 2 = 98 on 7x7)
     #   - Both players passing
     # Self play uses Tromp-Taylor rules (todo)
-    def getGameEndedSelfPlay(self, board, return_score=False, mcts=None):
+    def getGameEndedSelfPlay(self, board, return_score=False, predicted_ownership=None):
+        # without return_score, first rule out the positions that cannot end the game
+        # (see get_score_margin_bounds) before computing the exact score.
+        # With predicted_ownership (from the network's ownership head) the score threshold
+        # reads the dead stones from the prediction instead of finding them by simulations,
+        # a game ended by passes or the move cap is still counted with the exact score
+        predicted_score = None
+        if predicted_ownership is not None and len(board.history) > 10:
+            predicted_score, _ = self.get_predicted_score(board, predicted_ownership)
+        if not return_score and not self.can_end_self_play(board, predicted_score):
+            return 0
         winner = 0
-        score_is_cached = False
-        score = None
-        if mcts is not None:
-            # canonicalBoard = self.getCanonicalForm(board, board.current_player)
-            score_is_cached, score = mcts.checkScoreCache(board)
-        if score_is_cached:
-            (score_black, score_white) = score
+        if predicted_score is not None and not self.is_double_pass(board) and len(board.history) < self.max_moves:
+            (score_black, score_white) = predicted_score
         else:
+            # scores are cached process wide (see getScoreAndOwnership)
             (score_black, score_white) = self.getScore(board)
         by_score = 0.5 * ((board.n * board.n) + board.komi)
         black_difference = score_black - score_white
@@ -158,7 +197,7 @@ class GoGame(Game):
                     # Tie
                     winner = 1e-4
             # allow maximum number of moves to end game in self play scoring
-            elif len(board.history) >= 98:
+            elif len(board.history) >= self.max_moves:
                 # print("Self play ended by maximum move count reached")
                 if score_black > score_white:
                     if board.current_player == 1:
@@ -180,24 +219,18 @@ class GoGame(Game):
         return winner
 
     # Arena games can terminate according to:
-    #   - A move threshold (7 x 7 x 2 = 98)
+    #   - A move threshold (max_moves, 7 x 7 x 2 = 98 on 7x7)
     #   - Both players passing
     # Arena uses the Chinese ruleset (todo)
-    def getGameEndedArena(self, board, returnScore=False, mcts1=None, mcts2=None):
+    def getGameEndedArena(self, board, returnScore=False):
+        # without returnScore the score is only computed once the game has ended
+        if not returnScore and not self.is_double_pass(board) and len(board.history) < self.max_moves:
+            return 0
         winner = 0
-        score_is_cached = False
-        score = None
-        if mcts1 is not None:
-            score_is_cached, score = mcts1.checkScoreCache(board)
-        if mcts2 is not None and not score_is_cached:
-            score_is_cached, score = mcts2.checkScoreCache(board)
-        if score_is_cached:
-            (score_black, score_white) = score
-        else:
-            (score_black, score_white) = self.getScore(board)
+        (score_black, score_white) = self.getScore(board)
 
-        # limit games to 98 moves, determine winner based on score of current board
-        if len(board.history) >= 98:
+        # limit games to max_moves moves, determine winner based on score of current board
+        if len(board.history) >= self.max_moves:
             if score_black > score_white:
                 #if board.current_player == 1:
                 winner = 1
@@ -213,7 +246,7 @@ class GoGame(Game):
                 winner = 1e-4
 
         elif len(board.history) > 1:
-            # score threshold (by_score) is disabled, both players must pass to end game (or until 98 moves reached)
+            # score threshold (by_score) is disabled, both players must pass to end game (or until max_moves moves reached)
             if board.history[-1] is None and board.history[-2] is None:
                 if score_black > score_white:
                     #if board.current_player == 1:
@@ -233,54 +266,159 @@ class GoGame(Game):
             return winner, (score_black, score_white)
         return winner
 
+    def is_double_pass(self, board):
+        return len(board.history) > 1 and board.history[-1] is None and board.history[-2] is None
+
+    def can_end_self_play(self, board, predicted_score=None):
+        # cheap conditions first: too few moves, both players passing, move cap, and
+        # only then whether the score margin could be beyond by_score. With predicted_score
+        # (see get_predicted_score) the margin is read from it instead of bounded
+        if len(board.history) <= 3:
+            return False
+        if self.is_double_pass(board) or len(board.history) >= self.max_moves:
+            return True
+        by_score = 0.5 * ((board.n * board.n) + board.komi)
+        if predicted_score is not None:
+            low = high = predicted_score[0] - predicted_score[1]
+        else:
+            low, high = self.get_score_margin_bounds(board)
+        return high > by_score or low < -by_score
+
     # tromp taylor
     def getScore(self, board):
-        score_white = np.sum(board.pieces == -1)
-        score_black = np.sum(board.pieces == 1)
-        # empties = zip(*np.where(board.pieces == 0))
-        """if len(board.history) > 1:
-            print(f"History > 1 -- [-1] = {board.history[-1]} -- [-2] = {board.history[-2]}")"""
-        """print(f"Empties: {empties}")
-        print(f"Score black before eye: {score_black}")
-        print(f"Score white before eye: {score_white}")"""
-        """for empty in empties:
-            # Check that all surrounding points are of one color
-            if board.is_eyeish(empty, 1):
-                #print(f"Black Eye at {empty}")
-                score_black += 1
-            elif board.is_eyeish(empty, -1):
-                #print(f"White Eye at {empty}")
-                score_white += 1"""
-        score_white += board.komi
-        reach_mat = np.zeros((7, 7, 2))
-        reach_mat = self.get_reachable(board, reach_mat)
-        for i in range(7):
-            for j in range(7):
-                if reach_mat[i][j][0] == 1 and reach_mat[i][j][1] == 0:
-                    score_black += 1
-                elif reach_mat[i][j][0] == 0 and reach_mat[i][j][1] == 1:
-                    score_white += 1
-                #print(f"({reach_mat[i][j][0]}, {reach_mat[i][j][1]})", end="  ")
-            #print()
-        """for i in range(7):
-            for j in range(7):
-                print(f"({i}, {j}) - {board.group_sets[i][j]}")
-                for coord in board.group_sets[i][j]:
-                    
-                print()
-            print()"""
-        """for i in range(7):
-            for j in range(7):
-                print(f"({i}, {j}) - {board.liberty_sets[i][j]}")
-            print("\n")"""
-        #print(f"Black: {score_black}, White: {score_white}")
+        score, _ = self.getScoreAndOwnership(board)
+        return score
+
+    def getScoreAndOwnership(self, board):
+        # Tromp-Taylor area score: a player's stones plus the empty regions that only
+        # border that player's stones. Also returns the (n, n) ownership map of the
+        # position (1 black, -1 white, 0 neutral) the score was counted from.
+        # Results are kept in the process wide score cache, the ownership map is read-only
+        key = board.get_score_key()
+        if key is not None:
+            cached = self.score_cache.get(key)
+            if cached is not None:
+                return cached
+        ownership, borders = self.get_area_ownership(board)
+        score_black = np.count_nonzero(ownership == 1)
+        score_white = np.count_nonzero(ownership == -1) + board.komi
         if len(board.history) > 10:
-            score_black, score_white = self.get_dead_stones(board, score_black, score_white, reach_mat)
-        # else:
-            # print("NOT CHECKING DEADSTONES")
+            reach_mat = self.get_reachable(board, borders)
+            score_black, score_white = self.get_dead_stones(board, score_black, score_white, reach_mat, ownership)
         """score_white -= board.passes_white
         score_black -= board.passes_black"""
-        return (score_black, score_white)
+        ownership.flags.writeable = False
+        if key is not None:
+            self.score_cache.put(key, ((score_black, score_white), ownership))
+        return (score_black, score_white), ownership
+
+    def get_predicted_score(self, board, predicted_ownership):
+        # area score once the stones the ownership head gives to the opponent are removed.
+        # predicted_ownership is an (n, n) array in [-1, 1] in the colors of board.pieces,
+        # the stones whose value times their prediction is below -predicted_dead_threshold
+        # are dead and their points are counted like empty ones
+        pieces = np.array(board.pieces)
+        pieces[pieces * np.asarray(predicted_ownership).reshape(board.n, board.n) < -self.predicted_dead_threshold] = 0
+        ownership = self.get_area_ownership_batch(pieces[np.newaxis])[0]
+        score_black = np.count_nonzero(ownership == 1)
+        score_white = np.count_nonzero(ownership == -1) + board.komi
+        return (score_black, score_white), ownership
+
+    def get_area_ownership(self, board):
+        # (n, n) ownership of the stones and the empty regions bordered by one color only,
+        # and the region borders it was built from (see Board.get_region_borders)
+        borders = board.get_region_borders()
+        ownership = np.sign(board.pieces.ravel()).astype(np.int8)
+        ownership[borders == BORDERS_BLACK] = 1
+        ownership[borders == BORDERS_WHITE] = -1
+        return ownership.reshape(board.n, board.n), borders
+
+    def score_batch(self, boards, dead_stones=None, komi=5.5):
+        """
+        Tromp-Taylor area scores and ownership of many positions at once.
+        boards is a list of boards, or a (B, n, n) array of stone values (1 black, -1 white).
+        The territory of all positions is computed together with array operations, the
+        dead stone analysis only runs, board by board through getScoreAndOwnership, for
+        the positions flagged in dead_stones. For boards the flags default to what getScore
+        does (more than 10 moves played) so the results match getScore exactly, an array
+        of positions is only scored by area and cannot be flagged.
+        Returns (scores, ownership): a (B, 2) array of (black score, white score + komi)
+        and the (B, n, n) int8 ownership maps
+        """
+        if isinstance(boards, np.ndarray):
+            if dead_stones is not None and np.any(dead_stones):
+                raise ValueError("dead stone analysis needs boards, not an array of positions")
+            pieces = boards
+            komis = np.full(len(pieces), komi, dtype=np.float64)
+            dead_stones = []
+        else:
+            pieces = np.array([board.pieces for board in boards])
+            komis = np.array([board.komi for board in boards], dtype=np.float64)
+            if dead_stones is None:
+                dead_stones = [len(board.history) > 10 for board in boards]
+        pieces = pieces.reshape(-1, pieces.shape[-2], pieces.shape[-1])
+
+        ownership = self.get_area_ownership_batch(pieces)
+        scores = np.zeros((len(pieces), 2), dtype=np.float64)
+        scores[:, 0] = np.count_nonzero(ownership == 1, axis=(1, 2))
+        scores[:, 1] = np.count_nonzero(ownership == -1, axis=(1, 2)) + komis
+        for i in np.flatnonzero(dead_stones):
+            scores[i], ownership[i] = self.getScoreAndOwnership(boards[i])
+        return scores, ownership
+
+    def get_area_ownership_batch(self, pieces):
+        # ownership of a (B, n, n) array of positions, the empty points reached by one color only
+        # belong to it. Both colors spread through the empty points of all positions together,
+        # one step per iteration, until nothing changes
+        empty = pieces == 0
+        sources = np.stack([pieces == 1, pieces == -1])
+        passable = sources | empty
+        reached = sources
+        while True:
+            grown = reached.copy()
+            grown[..., 1:, :] |= reached[..., :-1, :]
+            grown[..., :-1, :] |= reached[..., 1:, :]
+            grown[..., :, 1:] |= reached[..., :, :-1]
+            grown[..., :, :-1] |= reached[..., :, 1:]
+            grown &= passable
+            if np.array_equal(grown, reached):
+                break
+            reached = grown
+        reach_black, reach_white = reached[0] & empty, reached[1] & empty
+        ownership = np.sign(pieces).astype(np.int8)
+        ownership[reach_black & ~reach_white] = 1
+        ownership[reach_white & ~reach_black] = -1
+        return ownership
+
+    def get_score_margin_bounds(self, board):
+        """
+        Bounds (low, high) on score_black - score_white as getScore would return it, without
+        running the dead stone playouts: the Tromp-Taylor margin widened by the most each
+        dead stone territory found on the board could move it if its stones were removed
+        """
+        ownership, _ = self.get_area_ownership(board)
+        margin = np.count_nonzero(ownership == 1) - np.count_nonzero(ownership == -1) - board.komi
+        if len(board.history) <= 10:
+            return margin, margin
+        vertical_groups, horizontal_groups = self.get_deadstone_groups(board)
+        dead_territories, dead_territories_exist = self.get_deadstone_territories(board, vertical_groups, horizontal_groups)
+        if not dead_territories_exist:
+            return margin, margin
+        low, high = margin, margin
+        for (territory, rows, columns, count_empty) in self.get_deadstone_rectangles(board, dead_territories):
+            owner = dead_territories[territory][2]
+            if owner == 0:
+                continue
+            area = board.pieces[rows.start:rows.stop, columns.start:columns.stop]
+            # each removed stone moves a point from one side to the other
+            swing = 2 * np.count_nonzero(area == -owner)
+            if count_empty:
+                swing += np.count_nonzero(area == 0)
+            if owner == 1:
+                high += swing
+            else:
+                low -= swing
+        return low, high
 
     # old score implementation, same as repo we originally forked from
     def getScore_old_system(self, board):
@@ -298,7 +436,7 @@ class GoGame(Game):
         score_black -= board.passes_black
         return (score_black, score_white)
     
-    def get_dead_stones(self, board, score_black, score_white, reach_mat):
+    def get_dead_stones(self, board, score_black, score_white, reach_mat, ownership=None):
         """
         Method to identify dead stones on the board and adjust the score accordingly
         """
@@ -324,87 +462,96 @@ class GoGame(Game):
         """
         Calculate score accounting for deadstones
         """
-        score_black, score_white = self.calculate_deadstone_score(board, dead_territories, left_above_deadstones, left_below_deadstones, right_above_deadstones, right_below_deadstones, score_black, score_white)
+        score_black, score_white = self.calculate_deadstone_score(board, dead_territories, left_above_deadstones, left_below_deadstones, right_above_deadstones, right_below_deadstones, score_black, score_white, ownership)
         # print(f"\nAfter Removing Deadstones, Score :: Black: {score_black}, White: {score_white}")
         return score_black, score_white
     
     def get_deadstone_groups(self, board):
+        n = board.n
+        last = n - 1
+
+        def edge_group(position):
+            # empty points have no group, skip the lookup
+            return board.get_group(position) if board.pieces[position] != 0 else ()
+
         vertical_groups = []
         # Check for 'vertical groups'
-        for c in range(1, 6, 1):
+        for c in range(1, last, 1):
             # Check groups starting at row 0
-            current_group_top = board.group_sets[0][c]
+            current_group_top = edge_group((0, c))
             if len(current_group_top) >= 3:
-                visited_intersections = [False for _ in range(7)]
+                visited_intersections = [False for _ in range(n)]
                 visited_intersections[0] = True
                 for coords in current_group_top:
                     if coords[1] == c:
                         visited_intersections[coords[0]] = True
                 vr_max = -1
-                for r in range(7):
+                for r in range(n):
                     if visited_intersections[r] == True:
                         vr_max += 1
                     else:
                         break
                 vertical_groups.append((0, vr_max, c))
-            # Check groups starting at row 6
-            current_group_bottom = board.group_sets[6][c]
+            # Check groups starting at the last row
+            current_group_bottom = edge_group((last, c))
             if len(current_group_bottom) >= 3:
-                visited_intersections = [False for _ in range(7)]
-                visited_intersections[6] = True
+                visited_intersections = [False for _ in range(n)]
+                visited_intersections[last] = True
                 for coords in current_group_bottom:
                     if coords[1] == c:
                         visited_intersections[coords[0]] = True
-                vr_min = 7
-                for r in range(6, -1, -1):
+                vr_min = n
+                for r in range(last, -1, -1):
                     if visited_intersections[r] == True:
                         vr_min -= 1
                     else:
                         break
-                if (vr_min, 6, c) not in vertical_groups:
-                    vertical_groups.append((vr_min, 6, c)) 
+                if (vr_min, last, c) not in vertical_groups:
+                    vertical_groups.append((vr_min, last, c)) 
         # Check for horizontal groups
         horizontal_groups = []
-        for r in range(1, 6, 1):
+        for r in range(1, last, 1):
             # Check groups starting at column 0
-            current_group_left = board.group_sets[r][0]
+            current_group_left = edge_group((r, 0))
             if len(current_group_left) >= 3:
-                visited_intersections = [False for _ in range(7)]
+                visited_intersections = [False for _ in range(n)]
                 visited_intersections[0] = True
                 for coords in current_group_left:
                     if coords[0] == r:
                         visited_intersections[coords[1]] = True
                 hc_max = -1
-                for c in range(7):
+                for c in range(n):
                     if visited_intersections[c] == True:
                         hc_max += 1
                     else:
                         break
                 horizontal_groups.append((0, hc_max, r))
-            # Check groups starting at column 6
-            current_group_right = board.group_sets[r][6]
+            # Check groups starting at the last column
+            current_group_right = edge_group((r, last))
             if len(current_group_right) >= 3:
-                visited_intersections = [False for _ in range(7)]
-                visited_intersections[6] = True
+                visited_intersections = [False for _ in range(n)]
+                visited_intersections[last] = True
                 for coords in current_group_right:
                     if coords[0] == r:
                         visited_intersections[coords[1]] = True
-                hc_min = 7
-                for c in range(6, -1, -1):
+                hc_min = n
+                for c in range(last, -1, -1):
                     if visited_intersections[c] == True:
                         hc_min -= 1
                     else:
                         break
-                if (hc_min, 6, r) not in horizontal_groups:
-                    horizontal_groups.append((hc_min, 6, r))
+                if (hc_min, last, r) not in horizontal_groups:
+                    horizontal_groups.append((hc_min, last, r))
         return vertical_groups, horizontal_groups
     
     def get_deadstone_territories(self, board, vertical_groups, horizontal_groups):
+        n = board.n
+        last = n - 1
         dead_territories = {
             'left_above': (-1, -1, 0),
-            'left_below': (-1, 7, 0),
-            'right_above': (7, -1, 0),
-            'right_below': (7, 7, 0)
+            'left_below': (-1, n, 0),
+            'right_above': (n, -1, 0),
+            'right_below': (n, n, 0)
         }
         current_board = board.pieces
         dead_territories_exist = False
@@ -440,7 +587,7 @@ class GoGame(Game):
                 is_above = False
                 is_below = False
                 # Check if the horizontal group may form an intersection
-                if col_min == 0 and col_max == 6:
+                if col_min == 0 and col_max == last:
                     possible_intersection = True
                     is_left = True
                     is_right = True
@@ -454,7 +601,7 @@ class GoGame(Game):
                 if not possible_intersection:
                     continue
                 # Check if the vertical group may form an intersection
-                if row_min == 0 and row_max == 6:
+                if row_min == 0 and row_max == last:
                     is_above = True
                     is_below = True
                 elif row_max == row_number or row_max == row_number-1:
@@ -469,15 +616,15 @@ class GoGame(Game):
                     if col_number > dead_territories['left_above'][0] and row_number > dead_territories['left_above'][1]:
                         dead_territories['left_above'] = (col_number, row_number, hg_color)
                         dead_territories_exist = True
-                if is_left and is_below and row_max == 6 and col_min == 0:
+                if is_left and is_below and row_max == last and col_min == 0:
                     if col_number > dead_territories['left_below'][0] and row_number < dead_territories['left_below'][1]:
                         dead_territories['left_below'] = (col_number, row_number, hg_color)
                         dead_territories_exist = True
-                if is_right and is_above and row_min == 0 and col_max == 6:
+                if is_right and is_above and row_min == 0 and col_max == last:
                     if col_number < dead_territories['right_above'][0] and row_number > dead_territories['right_above'][1]:
                         dead_territories['right_above'] = (col_number, row_number, hg_color)
                         dead_territories_exist = True
-                if is_right and is_below and row_max == 6 and col_max == 6:
+                if is_right and is_below and row_max == last and col_max == last:
                     if col_number < dead_territories['right_below'][0] and row_number < dead_territories['right_below'][1]:
                         dead_territories['right_below'] = (col_number, row_number, hg_color)
                         dead_territories_exist = True
@@ -485,307 +632,229 @@ class GoGame(Game):
         return dead_territories, dead_territories_exist
     
     def handle_deadstone_simulations(self, board, dead_territories, reach_mat):
+        n = board.n
+        # unconditionally alive stones per color, only computed if a territory needs them
+        alive_stones = {}
         # Simulate for lower-right region if there is one
         start_r = dead_territories['right_below'][1]
         start_c = dead_territories['right_below'][0]
         right_below_deadstones = False
-        if start_r != 7 and start_c != 7:
+        if start_r != n and start_c != n and not self.has_unconditionally_alive_stones(board, range(start_r, n), range(start_c, n), -dead_territories['right_below'][2], alive_stones):
             # print("\nRIGHT BELOW")
-            move_combos, contested_intersections_count = self.get_move_permutations(start_r+1, 7, start_c+1, 7, reach_mat, dead_territories['right_below'][2])
+            contested_moves, contested_intersections_count = self.get_contested_moves(start_r+1, n, start_c+1, n, reach_mat, dead_territories['right_below'][2])
             # print(contested_intersections_count)
             if contested_intersections_count > 0 and contested_intersections_count <= 2:
                 right_below_deadstones = True
-            elif contested_intersections_count > 0 and (contested_intersections_count < 5 or (dead_territories['right_below'][2] == board.current_player and contested_intersections_count == 5)):
-                right_below_deadstones = self.deadstone_simulation(board.copy(), move_combos, start_r+1, 7, start_c+1, 7, dead_territories['right_below'][2])
+            elif contested_intersections_count > 0 and (contested_intersections_count < 5 or (dead_territories['right_below'][2] == board.get_current_color() and contested_intersections_count == 5)):
+                right_below_deadstones = self.deadstone_simulation(board, contested_moves, start_r+1, n, start_c+1, n, dead_territories['right_below'][2])
         # Simulate for lower-left region if there is one
         start_r = dead_territories['left_below'][1]
         start_c = dead_territories['left_below'][0]
         left_below_deadstones = False
-        if start_r != 7 and start_c != -1:
+        if start_r != n and start_c != -1 and not self.has_unconditionally_alive_stones(board, range(start_r, n), range(0, start_c), -dead_territories['left_below'][2], alive_stones):
             # print("\nLEFT BELOW")
-            move_combos, contested_intersections_count = self.get_move_permutations(start_r+1, 7, 0, start_c, reach_mat, dead_territories['left_below'][2])
+            contested_moves, contested_intersections_count = self.get_contested_moves(start_r+1, n, 0, start_c, reach_mat, dead_territories['left_below'][2])
             if contested_intersections_count > 0 and contested_intersections_count <= 2:
                 left_below_deadstones = True
 
-            elif contested_intersections_count > 0 and (contested_intersections_count < 5 or (dead_territories['left_below'][2] == board.current_player and contested_intersections_count == 5)):
-                left_below_deadstones = self.deadstone_simulation(board.copy(), move_combos, start_r+1, 7, 0, start_c, dead_territories['left_below'][2])
+            elif contested_intersections_count > 0 and (contested_intersections_count < 5 or (dead_territories['left_below'][2] == board.get_current_color() and contested_intersections_count == 5)):
+                left_below_deadstones = self.deadstone_simulation(board, contested_moves, start_r+1, n, 0, start_c, dead_territories['left_below'][2])
         # Simulate for upper-left region if there is one
         start_r = dead_territories['left_above'][1]
         start_c = dead_territories['left_above'][0]
         left_above_deadstones = False
-        if start_r != -1 and start_c != -1:
+        if start_r != -1 and start_c != -1 and not self.has_unconditionally_alive_stones(board, range(0, start_r), range(0, start_c), -dead_territories['left_above'][2], alive_stones):
             # print("\nLEFT ABOVE")
-            move_combos, contested_intersections_count = self.get_move_permutations(0, start_r, 0, start_c, reach_mat, dead_territories['left_above'][2])
+            contested_moves, contested_intersections_count = self.get_contested_moves(0, start_r, 0, start_c, reach_mat, dead_territories['left_above'][2])
             if contested_intersections_count > 0 and contested_intersections_count <= 2:
                 left_above_deadstones = True
-            elif contested_intersections_count > 0 and (contested_intersections_count < 5 or (dead_territories['left_above'][2] == board.current_player and contested_intersections_count == 5)):
-                left_above_deadstones = self.deadstone_simulation(board.copy(), move_combos, 0, start_r, 0, start_c, dead_territories['left_above'][2])
+            elif contested_intersections_count > 0 and (contested_intersections_count < 5 or (dead_territories['left_above'][2] == board.get_current_color() and contested_intersections_count == 5)):
+                left_above_deadstones = self.deadstone_simulation(board, contested_moves, 0, start_r, 0, start_c, dead_territories['left_above'][2])
         # Simulate for upper-right region if there is one
         start_r = dead_territories['right_above'][1]
         start_c = dead_territories['right_above'][0]
         right_above_deadstones = False
-        if start_r != -1 and start_c != 7:
+        if start_r != -1 and start_c != n and not self.has_unconditionally_alive_stones(board, range(0, start_r), range(start_c, n), -dead_territories['right_above'][2], alive_stones):
             # print("\nRIGHT ABOVE")
-            move_combos, contested_intersections_count = self.get_move_permutations(0, start_r, start_c+1, 0, reach_mat, dead_territories['right_above'][2])
+            contested_moves, contested_intersections_count = self.get_contested_moves(0, start_r, start_c+1, 0, reach_mat, dead_territories['right_above'][2])
             if contested_intersections_count > 0 and contested_intersections_count <= 2:
                 right_above_deadstones = True
-            elif contested_intersections_count > 0 and (contested_intersections_count < 5 or (dead_territories['right_above'][2] == board.current_player and contested_intersections_count == 5)):
-                right_above_deadstones = self.deadstone_simulation(board.copy(), move_combos, 0, start_r, start_c+1, 0, dead_territories['right_above'][2])
+            elif contested_intersections_count > 0 and (contested_intersections_count < 5 or (dead_territories['right_above'][2] == board.get_current_color() and contested_intersections_count == 5)):
+                right_above_deadstones = self.deadstone_simulation(board, contested_moves, 0, start_r, start_c+1, 0, dead_territories['right_above'][2])
         
         return left_above_deadstones, left_below_deadstones, right_above_deadstones, right_below_deadstones
 
-    def get_move_permutations(self, start_r, end_r, start_c, end_c, reach_mat, dt_owner):
-        reach_test_contested = np.array([1, 1])
-        reach_test_white = np.array([0, 1])
-        reach_test_black = np.array([1, 0])
-        contested_intersections_count = 0
-        white_intersections_count = 0
-        black_intersections_count = 0
-        dt_moves = []
-        for i in range(start_r, end_r):
-            for j in range(start_c, end_c):
-                if np.array_equal(reach_mat[i, j], reach_test_contested) or (dt_owner == -1 and np.array_equal(reach_mat[i, j], reach_test_black)) or (dt_owner == 1 and np.array_equal(reach_mat[i, j], reach_test_white)):
-                    contested_intersections_count += 1
-                    new_move = i*7 + j
-                    dt_moves.append(new_move)
-                elif np.array_equal(reach_mat[i, j], reach_test_black):
-                    black_intersections_count += 1
-                elif np.array_equal(reach_mat[i, j], reach_test_white):
-                    white_intersections_count += 1
-        if contested_intersections_count <= 5 and contested_intersections_count > 2:
-            move_combos = list(permutations(dt_moves))
-            return move_combos, contested_intersections_count
-        else:
-            return None, contested_intersections_count
-    
-    def deadstone_simulation(self, board, move_combos, start_r, end_r, start_c, end_c, dt_owner):
-        # print(f"MOVE COMBOS: {len(move_combos)}")
-        stay_alive_count = 0
-        stones_are_dead = False
-        for m in range(len(move_combos)):
-            curr_moves = move_combos[m]
-            test_board = board.copy()
-            for i in range(len(curr_moves)):
+    def has_unconditionally_alive_stones(self, board, rows, columns, color, alive_stones):
+        # whether any stone of color in the territory is proven alive by Benson's algorithm,
+        # those stones can never be removed so the territory does not need to be simulated.
+        # alive_stones caches the result of the algorithm per color
+        if color not in alive_stones:
+            alive_stones[color], _ = unconditional_life(board, color)
+        alive = alive_stones[color].reshape(board.n, board.n)
+        return bool(alive[rows.start:rows.stop, columns.start:columns.stop].any())
+
+    def get_contested_moves(self, start_r, end_r, start_c, end_c, reach_mat, dt_owner):
+        # empty points of the territory reachable by both colors, or only by the
+        # color the territory is not owned by, in row major order
+        reach_black = reach_mat[start_r:end_r, start_c:end_c, 0] == 1
+        reach_white = reach_mat[start_r:end_r, start_c:end_c, 1] == 1
+        contested = reach_black & reach_white
+        if dt_owner == -1:
+            contested |= reach_black
+        elif dt_owner == 1:
+            contested |= reach_white
+        dt_moves = [int(self.geometry.coord_to_action[start_r + i, start_c + j]) for (i, j) in np.argwhere(contested)]
+        return dt_moves, len(dt_moves)
+
+    def deadstone_simulation(self, board, contested_moves, start_r, end_r, start_c, end_c, dt_owner):
+        """
+        Play the contested moves in every order and decide whether the stones of
+        -dt_owner inside the territory are dead: they are if at most stay_alive_threshold
+        of the orders leave them two points of their own territory there. Illegal moves
+        of an order are skipped.
+        The orders are walked as a tree of shared prefixes with play/undo on `board`,
+        which is left unchanged. Subtrees reached again by a transposition are looked
+        up by position hash, and the walk stops as soon as the orders left cannot
+        change the decision
+        """
+        n = board.n
+        total = math.factorial(len(contested_moves))
+        threshold = self.stay_alive_threshold
+        # orders played out so far and how many of them kept the stones alive
+        progress = {'done': 0, 'alive': 0}
+        # {(current hash, remaining moves): alive orders in that subtree}
+        subtrees = {}
+        # {position hash: whether the stones are alive in that final position}
+        outcomes = {}
+        # with positional superko the legal moves depend on the path, not just the position
+        use_transpositions = not board.enforce_superko
+
+        def stones_alive():
+            if board.position_hash not in outcomes:
+                borders = board.get_region_borders().reshape(n, n)[start_r:end_r, start_c:end_c]
+                if dt_owner == 1:
+                    outcomes[board.position_hash] = np.count_nonzero(borders == BORDERS_WHITE) >= 2
+                else:
+                    outcomes[board.position_hash] = np.count_nonzero(borders == BORDERS_BLACK) >= 2
+            return outcomes[board.position_hash]
+
+        def decided():
+            return ((progress['alive'] + total - progress['done']) / total <= threshold or
+                    progress['alive'] / total > threshold)
+
+        def walk(remaining):
+            # alive orders below this node, None once the decision is known
+            key = (board.current_hash, frozenset(remaining))
+            if use_transpositions and key in subtrees:
+                return subtrees[key]
+            alive = 0
+            for k in range(len(remaining)):
+                rest = remaining[:k] + remaining[k + 1:]
+                played = True
                 try:
-                    test_board = self.getNextState(test_board, curr_moves[i])
-                except:
-                    # print(f"Exception for move: {curr_moves[i]}")
-                    continue
-            reach_mat = np.zeros((7, 7, 2))
-            reach_mat = self.get_reachable(test_board, reach_mat)
-            reach_test_white = np.array([0, 1])
-            reach_test_black = np.array([1, 0])
-            white_intersections_count = 0
-            black_intersections_count = 0
-            for r in range(start_r, end_r):
-                for c in range(start_c, end_c):
-                    if np.array_equal(reach_mat[r, c], reach_test_black):
-                        black_intersections_count += 1
-                    elif np.array_equal(reach_mat[r, c], reach_test_white):
-                        white_intersections_count += 1
-            if white_intersections_count >= 2 and dt_owner == 1:
-                # print(f"SIM Board:\n{test_board.pieces}\nWhite Intersec: {white_intersections_count}, Black Intersec: {black_intersections_count}")
-                stay_alive_count += 1
-            elif black_intersections_count >= 2 and dt_owner == -1:
-                # print(f"White Intersec: {white_intersections_count}, Black Intersec: {black_intersections_count}")
-                stay_alive_count += 1
-            if (stay_alive_count + len(move_combos)-(m+1))/len(move_combos) <= self.stay_alive_threshold or stay_alive_count/len(move_combos) > self.stay_alive_threshold:
-                break
-        # print(f"Player {-dt_owner} Stay Alive Count: {stay_alive_count}")
-        if stay_alive_count/len(move_combos) <= self.stay_alive_threshold:
-            stones_are_dead = True
-            # print("WILL REMOVE DEADSTONES")
-        return stones_are_dead
-
-    def calculate_deadstone_score(self, board, dead_territories, left_above_deadstones, left_below_deadstones, right_above_deadstones, right_below_deadstones, score_black, score_white):
-        if left_above_deadstones:
-            for i in range(0, dead_territories['left_above'][1]):
-                for j in range(0, dead_territories['left_above'][0]):
-                    if board.pieces[i][j] == 1 and dead_territories['left_above'][2] == -1:
-                        score_black -= 1
-                        score_white += 1
-                    elif board.pieces[i][j] == -1 and dead_territories['left_above'][2] == 1:
-                        score_white -= 1
-                        score_black += 1
-        if left_below_deadstones:
-            for i in range(dead_territories['left_below'][1], 7):
-                for j in range(0, dead_territories['left_below'][0]):
-                    if board.pieces[i][j] == 1 and dead_territories['left_below'][2] == -1:
-                        score_black -= 1
-                        score_white += 1
-                    elif board.pieces[i][j] == -1 and dead_territories['left_below'][2] == 1:
-                        score_white -= 1
-                        score_black += 1
-                    if board.pieces[i][j] == 0 and dead_territories['left_below'][2] == -1:
-                        score_white += 1
-                    elif board.pieces[i][j] == 0 and dead_territories['left_below'][2] == 1:
-                        score_black += 1
-        if right_above_deadstones:
-            for i in range(0, dead_territories['right_above'][1]):
-                for j in range(dead_territories['right_above'][0], 7):
-                    if board.pieces[i][j] == 1 and dead_territories['right_above'][2] == -1:
-                        score_black -= 1
-                        score_white += 1
-                    elif board.pieces[i][j] == -1 and dead_territories['right_above'][2] == 1:
-                        score_white -= 1
-                        score_black += 1
-        if right_below_deadstones:
-            for i in range(dead_territories['right_below'][1], 7):
-                for j in range(dead_territories['right_below'][0], 7):
-                    if board.pieces[i][j] == 1 and dead_territories['right_below'][2] == -1:
+                    self.applyAction(board, remaining[k])
+                except IllegalMove:
+                    played = False
+                try:
+                    if rest:
+                        done = progress['done']
+                        child = walk(rest)
+                        if child is None:
+                            return None
+                        # orders of a transposed subtree were not counted on the way down
+                        if progress['done'] == done:
+                            progress['done'] += math.factorial(len(rest))
+                            progress['alive'] += child
+                    else:
+                        child = 1 if stones_alive() else 0
+                        progress['done'] += 1
+                        progress['alive'] += child
+                finally:
+                    if played:
+                        self.undoAction(board)
+                alive += child
+                if decided():
+                    return None
+            if use_transpositions:
+                subtrees[key] = alive
+            return alive
+
+        walk(list(contested_moves))
+        return progress['alive'] / total <= threshold
+
+    def calculate_deadstone_score(self, board, dead_territories, left_above_deadstones, left_below_deadstones, right_above_deadstones, right_below_deadstones, score_black, score_white, ownership=None):
+        stones_are_dead = {'left_above': left_above_deadstones, 'left_below': left_below_deadstones,
+                           'right_above': right_above_deadstones, 'right_below': right_below_deadstones}
+        for (territory, rows, columns, count_empty) in self.get_deadstone_rectangles(board, dead_territories):
+            if not stones_are_dead[territory]:
+                continue
+            owner = dead_territories[territory][2]
+            for i in rows:
+                for j in columns:
+                    piece = board.pieces[i][j]
+                    if piece == 1 and owner == -1:
                         score_black -= 1
                         score_white += 1
-                    elif board.pieces[i][j] == -1 and dead_territories['right_below'][2] == 1:
+                    elif piece == -1 and owner == 1:
                         score_white -= 1
                         score_black += 1
-                    if board.pieces[i][j] == 0 and dead_territories['right_below'][2] == -1:
+                    elif piece == 0 and count_empty and owner == -1:
                         score_white += 1
-                    elif board.pieces[i][j] == 0 and dead_territories['right_below'][2] == 1:
+                    elif piece == 0 and count_empty and owner == 1:
                         score_black += 1
-        
+                    else:
+                        continue
+                    # the point now counts for the territory owner
+                    if ownership is not None:
+                        ownership[i][j] = owner
+
         return score_black, score_white
 
-
-    def get_reachable(self, board, reach_mat):
-        changed = []
-        for i in range(7):
-            for j in range(7):
-                if board.pieces[i][j] == 1:
-                    color_idx = 0
-                elif board.pieces[i][j] == -1:
-                    color_idx = 1
-                else:
-                    continue
-                for k in range(i - 1, -1, -1):
-                    if board.pieces[k][j] == 0 and reach_mat[k][j][color_idx] == 0:
-                        reach_mat[k][j][color_idx] = 1
-                        changed.append((k, j))
-                    else:
-                        break
-                for k in range(i + 1, 7, 1):
-                    if board.pieces[k][j] == 0 and reach_mat[k][j][color_idx] == 0:
-                        reach_mat[k][j][color_idx] = 1
-                        changed.append((k, j))
-                    else:
-                        break
-                for k in range(j - 1, -1, -1):
-                    if board.pieces[i][k] == 0 and reach_mat[i][k][color_idx] == 0:
-                        reach_mat[i][k][color_idx] = 1
-                        changed.append((i, k))
-                    else:
-                        break
-                for k in range(j + 1, 7, 1):
-                    if board.pieces[i][k] == 0 and reach_mat[i][k][color_idx] == 0:
-                        reach_mat[i][k][color_idx] = 1
-                        changed.append((i, k))
-                    else:
-                        break
-        for p in range(len(changed)):
-            i = changed[p][0]
-            j = changed[p][1]
-            if board.pieces[i][j] == 0:
-                if i > 0:
-                    for k in range(i - 1, -1, -1):
-                        if board.pieces[k][j] != 0:
-                            break
-                        if reach_mat[k][j][0] == 0 and reach_mat[i][j][0] == 1:
-                            reach_mat[k][j][0] = 1
-                        if reach_mat[k][j][1] == 0 and reach_mat[i][j][1] == 1:
-                            reach_mat[k][j][1] = 1
-                if i < 6:
-                    for k in range(i + 1, 7, 1):
-                        if board.pieces[k][j] != 0:
-                            break
-                        if reach_mat[k][j][0] == 0 and reach_mat[i][j][0] == 1:
-                            reach_mat[k][j][0] = 1
-                        if reach_mat[k][j][1] == 0 and reach_mat[i][j][1] == 1:
-                            reach_mat[k][j][1] = 1
-                if j > 0:
-                    for k in range(j - 1, -1, -1):
-                        if board.pieces[i][k] != 0:
-                            break
-                        if reach_mat[i][k][0] == 0 and reach_mat[i][j][0] == 1:
-                            reach_mat[i][k][0] = 1
-                        if reach_mat[i][k][1] == 0 and reach_mat[i][j][1] == 1:
-                            reach_mat[i][k][1] = 1
-                if j < 6:
-                    for k in range(j + 1, 7, 1):
-                        if board.pieces[i][k] != 0:
-                            break
-                        if reach_mat[i][k][0] == 0 and reach_mat[i][j][0] == 1:
-                            reach_mat[i][k][0] = 1
-                        if reach_mat[i][k][1] == 0 and reach_mat[i][j][1] == 1:
-                            reach_mat[i][k][1] = 1
-        for i in range(7):
-            for j in range(7):
-                if board.pieces[i][j] != 0:
-                    continue
-                elif board.pieces[i][j] == 0 and (reach_mat[i][j][0] != 1 or reach_mat[i][j][1] != 1):
-                    if i > 0:
-                        for k in range(i - 1, -1, -1):
-                            if board.pieces[k][j] != 0 or (reach_mat[i][j][0] == 1 and reach_mat[i][j][1] == 1):
-                                break
-                            if reach_mat[k][j][0] == 1 and reach_mat[i][j][0] == 0:
-                                reach_mat[i][j][0] = 1
-                            if reach_mat[k][j][1] == 1 and reach_mat[i][j][1] == 0:
-                                reach_mat[i][j][1] = 1
-                    if i < 6:
-                        for k in range(i + 1, 7, 1):
-                            if board.pieces[k][j] != 0 or (reach_mat[i][j][0] == 1 and reach_mat[i][j][1] == 1):
-                                break
-                            if reach_mat[k][j][0] == 1 and reach_mat[i][j][0] == 0:
-                                reach_mat[i][j][0] = 1
-                            if reach_mat[k][j][1] == 1 and reach_mat[i][j][1] == 0:
-                                reach_mat[i][j][1] = 1
-                    if j > 0:
-                        for k in range(j - 1, -1, -1):
-                            if board.pieces[i][k] != 0 or (reach_mat[i][j][0] == 1 and reach_mat[i][j][1] == 1):
-                                break
-                            if reach_mat[i][k][0] == 1 and reach_mat[i][j][0] == 0:
-                                reach_mat[i][j][0] = 1
-                            if reach_mat[i][k][1] == 1 and reach_mat[i][j][1] == 0:
-                                reach_mat[i][j][1] = 1
-                    if j < 6:
-                        for k in range(j + 1, 7, 1):
-                            if board.pieces[i][k] != 0 or (reach_mat[i][j][0] == 1 and reach_mat[i][j][1] == 1):
-                                break
-                            if reach_mat[i][k][0] == 1 and reach_mat[i][j][0] == 0:
-                                reach_mat[i][j][0] = 1
-                            if reach_mat[i][k][1] == 1 and reach_mat[i][j][1] == 0:
-                                reach_mat[i][j][1] = 1
-        return reach_mat
+    def get_deadstone_rectangles(self, board, dead_territories):
+        # (territory, rows, columns, empty points count for the territory owner) of the
+        # points calculate_deadstone_score gives to the owner of each dead stone territory
+        n = board.n
+        return [
+            ('left_above', range(0, dead_territories['left_above'][1]), range(0, dead_territories['left_above'][0]), False),
+            ('left_below', range(dead_territories['left_below'][1], n), range(0, dead_territories['left_below'][0]), True),
+            ('right_above', range(0, dead_territories['right_above'][1]), range(dead_territories['right_above'][0], n), False),
+            ('right_below', range(dead_territories['right_below'][1], n), range(dead_territories['right_below'][0], n), True),
+        ]
+
+    def get_reachable(self, board, borders=None):
+        # (n, n, 2) matrix marking the empty points whose region reaches a black
+        # stone ([..., 0]) and a white stone ([..., 1]), see Board.get_region_borders
+        if borders is None:
+            borders = board.get_region_borders()
+        reach_mat = np.zeros((board.n * board.n, 2))
+        reach_mat[:, 0] = (borders & BORDERS_BLACK) != 0
+        reach_mat[:, 1] = (borders & BORDERS_WHITE) != 0
+        return reach_mat.reshape(board.n, board.n, 2)
 
     def getCanonicalForm(self, board, player):
         # return state if player==1, else return -state if player==-1
-        canonicalBoard = board.copy()
-
-        # canonicalBoard.pieces= board.pieces* player
-        if player == -1:
-            canonicalBoard.pieces = np.where(canonicalBoard.pieces == 1, -1,
-                                             np.where(canonicalBoard.pieces == -1, 1, canonicalBoard.pieces))
-        return canonicalBoard
+        # the view shares the board's storage, call copy() on it for an independent board
+        return CanonicalView(board, player)
 
     # modified
     def getSymmetries(self, board, pi):
         # mirror, rotational
         assert (len(pi) == self.n ** 2 + 1)  # 1 for pass
-        pi_board = np.reshape(pi[:-1], (self.n, self.n))
-        l = []
-        history_syms = []
-        # b_pieces = board.pieces
-        for i in range(1, 5):
-            for j in [True, False]:
-                history_syms = []
-                for k in range(len(board)):
-                    newB = np.rot90(board[k], i)
-                    if j:
-                        newB = np.fliplr(newB)
-                    history_syms.append(newB)
-                newPi = np.rot90(pi_board, i)
-                if j:
-                    newPi = np.fliplr(newPi)
-                l += [(history_syms, list(newPi.ravel()) + [pi[-1]])]
-        return l
+        perms = self.geometry.symmetries
+        order = SYMMETRY_ORDER
+        # all 8 symmetries of the (planes, n, n) stack, or of a batch of stacks, in one take
+        planes = np.asarray(board)
+        flat = planes.reshape(planes.shape[:-2] + (self.n * self.n,))
+        history_syms = np.moveaxis(np.take(flat, perms[order, :-1], axis=-1), -2, 0)
+        history_syms = history_syms.reshape((8,) + planes.shape)
+        pi_syms = np.asarray(pi)[perms[order]]
+        return [(history_syms[k], pi_syms[k].tolist()) for k in range(8)]
+
+    def getOwnershipSymmetries(self, ownership):
+        # the 8 symmetries of an (n, n) ownership plane as an (8, n, n) array, in the
+        # order of getSymmetries so that they line up with its boards
+        perms = self.geometry.symmetries[SYMMETRY_ORDER, :-1]
+        return np.asarray(ownership).reshape(self.n * self.n)[perms].reshape(8, self.n, self.n)
 
     def stringRepresentation(self, board, is_canonical=True):
         # 8x8 numpy array (canonical board)
@@ -801,63 +870,21 @@ class GoGame(Game):
         # print(board_string)
         # return np.array(board.pieces).tostring()
 
-    def getCanonicalHistory(self, x_boards, y_boards, canonicalBoard, player_board):
-        history = []
-        board_pieces = canonicalBoard.pieces
-        new_x = np.copy(board_pieces)
-
-        if -1 in board_pieces:
-            new_x[new_x == -1] = 0
-        else:
-            new_x = board_pieces
-
-        x_boards.append(new_x)
-
-        board_pieces = np.where(board_pieces == 1, -1, np.where(board_pieces == -1, 1, board_pieces))
-
-        new_y = np.copy(board_pieces)
-        if -1 in board_pieces:
-            new_y[new_y == -1] = 0
-        else:
-            new_y = board_pieces
-        y_boards.append(new_y)
-
-        x_boards = x_boards[1:]
-        y_boards = y_boards[1:]
-
-        for i in range(len(x_boards) - 1, -1, -1):
-            history.append(x_boards[i])
-            history.append(y_boards[i])
-
-        history.append(self.make_sensibility_layer(canonicalBoard))
-        history.append(player_board[0])
-        history.append(player_board[1])
-
-        return history, x_boards, y_boards
-
-    def make_sensibility_layer(self, canonicalBoard):
-        legal_and_not_eye = np.zeros((self.n, self.n))
-        legal_moves = canonicalBoard.get_legal_moves(1)
-        for i in range(self.n):
-            for j in range(self.n):
-                if not canonicalBoard.is_eye((i, j), 1) and ((i, j) in legal_moves):
-                    legal_and_not_eye[i, j] = 1
-        return legal_and_not_eye
-
-    def init_x_y_boards(self):
-        x_boards = []
-        y_boards = []
-        for i in range(8):
-            x_boards.append(np.zeros((self.n, self.n)))
-            y_boards.append(np.zeros((self.n, self.n)))
+    def getStateKey(self, board):
+        # 64-bit key of the board and the moves that led to it, kept up to date by every move
+        # (see Board.get_state_key), it tells apart what stringRepresentation does in O(1)
+        return board.get_state_key()
 
-        return x_boards, y_boards
+    def getTranspositionKey(self, board):
+        # 64-bit key shared by the move orders that reach the same position with the same
+        # history planes (see Board.get_transposition_key), used by MCTS with transpositions
+        return board.get_transposition_key()
 
 
 def display(board):
     state = "   |"
     b_pieces = np.array(board.pieces)
-    n = 7
+    n = board.n
     alphabet = ["A", "B", "C", "D", "E", "F", "G", "H", "I", "J", "K", "L", "M", "N", "O", "P", "Q", "R", "S"]
     divider = "---|"
     for y in range(n):
@@ -1,5 +1,8 @@
 import numpy as np
 
+from go.feature_encoder import FeatureEncoder, HISTORY_LENGTH
+from go.geometry import get_geometry
+
 '''
 Board class.
 Board data:
@@ -10,11 +13,33 @@ BLACK = +1
 EMPTY = 0
 PASS_MOVE = None
 
+# Eye pattern table: each point is encoded by its 3x3 neighborhood seen from the
+# owner, 2 bits per surrounding cell (4 orthogonal cells then 4 diagonals)
+CELL_OWN, CELL_OPPONENT, CELL_EMPTY, CELL_OFF_BOARD = 0, 1, 2, 3
+# verdicts stored in the table, EYE_CHECK_DIAGONALS still depends on whether
+# the empty diagonal points are eyes themselves
+NOT_EYE, EYE, EYE_CHECK_DIAGONALS = 0, 1, 2
+# cell class indexed by (stone color * owner + 1), and the weight of each surrounding cell in the code
+CELL_CLASSES = np.array([CELL_OPPONENT, CELL_EMPTY, CELL_OWN], dtype=np.intp)
+CELL_WEIGHTS = 4 ** np.arange(8)
+
+# Colors bordering an empty region, as bits (see get_region_borders)
+BORDERS_BLACK, BORDERS_WHITE = 1, 2
+
+# Ladder readings memoized per board (and its copies) before the memo is reset
+LADDER_CACHE_SIZE = 100000
+
 
 class Board:
-    # Looking up positions adjacent to a given position takes a surprising
-    # amount of time, hence this shared lookup table {boardsize: {position: [neighbors]}}
-    __NEIGHBORS_CACHE = {}
+    # Zobrist keys are shared by all boards of the same size so hashes are comparable
+    # between boards, {boardsize: ({color: [[key]]}, [[ko key]], side to move key)}
+    __ZOBRIST_CACHE = {}
+    # Zobrist keys of (move number, action) for the history hash, grown on demand one block
+    # of moves at a time, {boardsize: (random generator, [[key per action] per move number])}
+    __HISTORY_KEYS = {}
+    # Eye pattern table, the same for every board size since off-board cells are
+    # part of the code: (verdict per code, allowed bad diagonals per code)
+    __EYE_TABLE = None
 
     def __init__(self, n):
         self.n = n
@@ -32,12 +57,54 @@ class Board:
         self.passes_white = 0
         self.passes_black = 0
 
+        self._create_neighbors_cache()
+        self._init_groups()
+
+        # on-the-fly record of 'age' of each stone
+        self.stone_ages = np.zeros((n, n), dtype=np.int_) - 1
+
+        self.enforce_superko = False
+        # Incremental 64-bit Zobrist hashing:
+        #   - `position_hash` covers the stones only and is what positional superko compares
+        #   - `current_hash` additionally includes the side to move and the ko point, it is
+        #     the key to use when caching anything about this position
+        #   - `previous_hashes` holds the position_hash after every stone played so far
+        #   - `history_hash` covers the sequence of moves played (each move number and action),
+        #     see get_state_key
+        #   - `position_hashes` holds the position_hash before every move of the history,
+        #     see get_transposition_key
+        # The stone keys are applied in absolute colors (see invert_colors)
+        self._create_zobrist_keys()
+        self._hash_color_sign = 1
+        self.position_hash = 0
+        self.current_hash = 0
+        self.history_hash = 0
+        self.previous_hashes = set()
+        self.position_hashes = []
+        # records of the moves made with play(), popped by undo()
+        self.move_stack = []
+        # legal move masks of the current player, {allow_pass: int8 array}, cleared on every move
+        self._legal_masks = {}
+
+        # network input: the last 8 positions are pushed to the encoder move by move,
+        # the 19 planes are only assembled when get_features() is called
+        self.features = FeatureEncoder(n)
+        self._features_stale = True
+        # append the ladder capture/escape planes to the network input
+        self.ladder_features = False
+        # ladder readings {(position hash, kind, move, color, prey, depth): result}, shared by copies
+        self._ladder_cache = {}
+        self.current_player = 1
+
+    def _init_groups(self):
+        """Set up the structures that track groups and liberties for an empty board
+        """
+        n = self.n
         # `self.liberty_sets` is a 2D array with the same indexes as `board`
         # each entry points to a set of tuples - the liberties of a stone's
         # connected block. By caching liberties in this way, we can directly
         # optimize update functions (e.g. execute_move) and in doing so indirectly
         # speed up any function that queries liberties
-        self._create_neighbors_cache()
         self.liberty_sets = [[set() for _ in range(n)] for _ in range(n)]
         for x in range(n):
             for y in range(n):
@@ -51,117 +118,46 @@ class Board:
         # containing all (x',y') pairs in the group connected to (x,y)
         self.group_sets = [[set() for _ in range(n)] for _ in range(n)]
 
-        # on-the-fly record of 'age' of each stone
-        self.stone_ages = np.zeros((n, n), dtype=np.int_) - 1
-
-        self.enforce_superko = False
-        # rng = np.random.RandomState(0)
-        """self.hash_lookup = {
-            WHITE: rng.randint(np.iinfo(np.uint64).max, size=(n, n), dtype='uint64'),
-            BLACK: rng.randint(np.iinfo(np.uint64).max, size=(n, n), dtype='uint64')}
-        self.current_hash = np.uint64(0)
-        self.previous_hashes = set()"""
-        self.previous_boards = []
-        self.current_board = np.array(self.pieces).tostring()
-
-        self.x_boards = [np.zeros((self.n, self.n)) for _ in range(8)]
-        self.y_boards = [np.zeros((self.n, self.n)) for _ in range(8)]
-        self.canonical_history = []
-        # Initialize canonical history
-        for i in range(len(self.x_boards)): # X and Y boards
-            self.canonical_history.append(self.x_boards[i])
-            self.canonical_history.append(self.y_boards[i])
-        self.canonical_history.append(np.ones((self.n, self.n))) # Sensibility Layer
-        self.canonical_history.append(np.ones((self.n, self.n))) # Current Player
-        self.canonical_history.append(np.zeros((self.n, self.n))) # Opposing Player
-        self.current_player = 1
+    def get_features(self):
+        """
+        Network input of the current position as a (19, N, N) float32 array:
+            - The current/opposing player's stones for the last 8 timesteps
+            ----> 16 layers total -- 8 for each player
+            - The 'sensibility layer'
+            - Two layers encoding the current player/opposing player (all 1s for black, all 0s for white)
+            - With ladder_features, the ladder capture and ladder escape layers
+        The array is shared and rewritten once the board changes, use
+        get_canonical_history() to keep a copy
+        """
+        if self._features_stale:
+            # read the ladders first, they play and take back moves on this board
+            extra_planes = self.get_ladder_planes() if self.ladder_features else None
+            self.features.encode(self.current_player, self.make_sensibility_layer(), extra_planes)
+            self._features_stale = False
+        return self.features.planes
 
     def get_canonical_history(self):
-        return self.canonical_history.copy()
+        return self.get_features().copy()
+
+    def _clear_caches(self):
+        """Drop everything cached for the current position
+        """
+        self._legal_masks.clear()
+        self._features_stale = True
+
+    def get_current_color(self):
+        """Value of the current player's stones in self.pieces (flipped by invert_colors)
+        """
+        return self.current_player * self._hash_color_sign
 
     def set_current_player(self, new_player):
         if self.current_player == new_player:
             return
         else:
-            # Set new (current) player/flip x & y boards (current/opposing histories)
+            # the encoder reads own/opposing stones from the frames using current_player
             self.current_player = new_player
-            self.x_boards, self.y_boards = self.y_boards, self.x_boards
-            new_history = []
-
-            # Move history (from boards matching new player)
-            for i in range(len(self.x_boards)):
-                new_history.append(self.x_boards[i])
-                new_history.append(self.y_boards[i])
-            
-            # Sensibility Layer
-            new_history.append(self.make_sensibility_layer())
-
-            # Player boards (All 1s/0s)
-            if self.current_player == 1:
-                new_history.append(np.ones((self.n, self.n)))
-                new_history.append(np.zeros((self.n, self.n)))
-            else:
-                new_history.append(np.zeros((self.n, self.n)))
-                new_history.append(np.zeros((self.n, self.n)))
-            self.canonical_history = new_history
-            
-
-
-    #def get_canonical_history_with_update(self):
-        """
-        Method to construct the game history from the perspective of the current player
-        Returns a 19xNxN matrix containing:
-            - The current/opposing player's stones for the last 8 timesteps
-            ----> 16 layers total -- 8 for each player
-            - The 'sensibility layer'
-            - Two layers encoding the current player/opposing player (all 1s for black, all 0s for white) 
-        """
-        """history = []
-        canonical_board = np.where(self.pieces != 0, self.pieces * self.current_player, 0)
-        # new_x = np.copy(canonical_board)
-        new_x = np.where(canonical_board == 1, 1, 0)
-        self.x_boards.append(new_x)
-        new_y = np.where(canonical_board == -1, 1, 0)
-        self.y_boards.append(new_y)
-
-        # Remove the oldest board state from history
-        self.x_boards = self.x_boards[1:]
-        self.y_boards = self.y_boards[1:]
-
-        for i in range(len(self.x_boards) - 1, -1, -1):
-            history.append(self.x_boards[i])
-            history.append(self.y_boards[i])
-        history.append(self.make_sensibility_layer())
-        if self.current_player == 1:
-            history.append(np.ones((self.n, self.n)))
-            history.append(np.zeros((self.n, self.n)))
-        else:
-            history.append(np.zeros((self.n, self.n)))
-            history.append(np.ones((self.n, self.n)))
-        return history"""
-    
-    #def get_canonical_history_no_update(self):
-        """
-        Method to construct the game history from the perspective of the current player
-        Returns a 19xNxN matrix containing:
-            - The current/opposing player's stones for the last 8 timesteps
-            ----> 16 layers total -- 8 for each player
-            - The 'sensibility layer'
-            - Two layers encoding the current player/opposing player (all 1s for black, all 0s for white) 
-        """
-        """history = []
-
-        for i in range(len(self.x_boards) - 1, -1, -1):
-            history.append(self.x_boards[i])
-            history.append(self.y_boards[i])
-        history.append(self.make_sensibility_layer())
-        if self.current_player == 1:
-            history.append(np.ones((self.n, self.n)))
-            history.append(np.zeros((self.n, self.n)))
-        else:
-            history.append(np.zeros((self.n, self.n)))
-            history.append(np.ones((self.n, self.n)))
-        return history"""
+            self._refresh_current_hash()
+            self._clear_caches()
 
     def make_sensibility_layer(self):
         """
@@ -170,13 +166,9 @@ class Board:
         This is a NxN matrix marking all legal moves that do not fill 
         in the current player's own eyes
         """
-        legal_and_not_eye = np.zeros((self.n, self.n))
-        legal_moves = self.get_legal_moves(self.current_player)
-        for i in range(self.n):
-            for j in range(self.n):
-                if not self.is_eye((i, j), self.current_player) and ((i, j) in legal_moves):
-                    legal_and_not_eye[i, j] = 1
-        return legal_and_not_eye
+        color = self.get_current_color()
+        legal_and_not_eye = self._legal_points(color) & ~self.get_eyes(color)
+        return legal_and_not_eye.reshape(self.n, self.n).astype(np.float32)
 
     def getStringRepresentation(self):
         # canonical_board = np.where(self.pieces != 0, self.pieces*self.current_player, 0)
@@ -184,11 +176,13 @@ class Board:
         return np.array(self.pieces).tostring()
 
     def rotate_history(self, r, history):
-        for i in range(len(history)):
-            history[i] = np.rot90(history[i], r % 4)
-            if r >= 4:
-                history[i] = np.fliplr(history[i])
-        return history
+        """Apply symmetry r (see Geometry.symmetries) to a stack of planes,
+        returns a new (planes, N, N) array
+        """
+        perms = self.geometry.symmetries
+        history = np.asarray(history)
+        flat = history.reshape(history.shape[:-2] + (self.n * self.n,))
+        return np.take(flat, perms[r, :-1], axis=-1).reshape(history.shape)
 
     # add [][] indexer syntax to the Board
     def __getitem__(self, index):
@@ -209,6 +203,13 @@ class Board:
         # given that this is already cached, it is a fast lookup
         return self.group_sets[x][y]
 
+    def get_liberties(self, position):
+        """Get the liberties of the group containing the given position as a set
+        of (x, y) tuples. For an empty position these are its empty neighbors.
+        """
+        (x, y) = position
+        return self.liberty_sets[x][y]
+
     def get_groups_around(self, position):
         """returns a list of the unique groups adjacent to position
         'unique' means that, for example in this position:
@@ -233,25 +234,66 @@ class Board:
         return x >= 0 and y >= 0 and x < self.n and y < self.n
 
     def _create_neighbors_cache(self):
-        if self.n not in Board.__NEIGHBORS_CACHE:
-            Board.__NEIGHBORS_CACHE[self.n] = {}
-            for x in range(self.n):
-                for y in range(self.n):
-                    neighbors = [xy for xy in [(x - 1, y), (x + 1, y), (x, y - 1), (x, y + 1)]
-                                 if self._on_board(xy)]
-                    Board.__NEIGHBORS_CACHE[self.n][(x, y)] = neighbors
+        # looking up positions adjacent to a given position takes a surprising
+        # amount of time, the tables are precomputed once per board size
+        self.geometry = get_geometry(self.n)
+        self._neighbors_table = self.geometry.neighbors
+        self._diagonals_table = self.geometry.diagonals
+        self._neighbor_index = self.geometry.neighbor_index
+        self._surround_index = self.geometry.surround_index
+        self._create_eye_table()
+
+    def _create_eye_table(self):
+        """Precompute the eye verdict of every 3x3 pattern, following is_eye():
+        the point must be surrounded by own stones (or the edge), and there may
+        be at most 1 'bad' diagonal in the middle of the board, 0 on edges and
+        corners, where a bad diagonal is an opponent stone or an empty non-eye
+        """
+        if Board.__EYE_TABLE is None:
+            codes = np.arange(4 ** 8)
+            cells = (codes[:, None] >> (2 * np.arange(8))) & 3
+            orthogonal, diagonal = cells[:, :4], cells[:, 4:]
+            eyeish = ((orthogonal == CELL_OWN) | (orthogonal == CELL_OFF_BOARD)).all(axis=1)
+            allowed = np.where((orthogonal == CELL_OFF_BOARD).any(axis=1), 0, 1)
+            opponent = (diagonal == CELL_OPPONENT).sum(axis=1)
+            empty = (diagonal == CELL_EMPTY).sum(axis=1)
+            verdict = np.where(~eyeish | (opponent > allowed), NOT_EYE,
+                               np.where(opponent + empty <= allowed, EYE, EYE_CHECK_DIAGONALS))
+            Board.__EYE_TABLE = (verdict.astype(np.int8), allowed.astype(np.int8))
+        self._eye_verdicts, self._eye_allowed = Board.__EYE_TABLE
+
+    def _create_zobrist_keys(self):
+        if self.n not in Board.__ZOBRIST_CACHE:
+            rng = np.random.RandomState(0)
+            hash_lookup = {
+                WHITE: rng.randint(np.iinfo(np.uint64).max, size=(self.n, self.n), dtype='uint64').tolist(),
+                BLACK: rng.randint(np.iinfo(np.uint64).max, size=(self.n, self.n), dtype='uint64').tolist()}
+            ko_lookup = rng.randint(np.iinfo(np.uint64).max, size=(self.n, self.n), dtype='uint64').tolist()
+            side_key = int(rng.randint(np.iinfo(np.uint64).max, dtype='uint64'))
+            Board.__ZOBRIST_CACHE[self.n] = (hash_lookup, ko_lookup, side_key)
+        self.hash_lookup, self.ko_lookup, self.side_key = Board.__ZOBRIST_CACHE[self.n]
+
+    def _history_key(self, move_number, action):
+        """Zobrist key of playing `action` (a position or None for a pass) as move `move_number`
+        """
+        if self.n not in Board.__HISTORY_KEYS:
+            Board.__HISTORY_KEYS[self.n] = (np.random.RandomState(1), [])
+        rng, keys = Board.__HISTORY_KEYS[self.n]
+        while move_number >= len(keys):
+            keys.extend(rng.randint(np.iinfo(np.uint64).max, size=(self.n * self.n, self.n * self.n + 1),
+                                    dtype='uint64').tolist())
+        return keys[move_number][self.geometry.to_action(action)]
 
     def _neighbors(self, position):
         """A private helper function that simply returns a list of positions neighboring
         the given (x,y) position. Basically it handles edges and corners.
         """
-        return Board.__NEIGHBORS_CACHE[self.n][position]
+        return self._neighbors_table[position]
 
     def _diagonals(self, position):
         """Like _neighbors but for diagonal positions
         """
-        (x, y) = position
-        return filter(self._on_board, [(x - 1, y - 1), (x + 1, y + 1), (x + 1, y - 1), (x - 1, y + 1)])
+        return self._diagonals_table[position]
 
     def _update_neighbors(self, position, color):
 
@@ -289,14 +331,66 @@ class Board:
             self.liberty_sets[gx][gy] = merged_libs
             self.liberty_counts[gx][gy] = count_merged_libs
 
-    """
     def _update_hash(self, action, color):
+        """Toggle a stone of `color` at `action` in the position hash
+        """
         (x, y) = action
-        self.current_hash = np.bitwise_xor(self.current_hash, self.hash_lookup[color][x][y])
-    """
+        self.position_hash ^= self.hash_lookup[color * self._hash_color_sign][x][y]
 
-    def _update_current_board(self, action, color):
-        self.current_board = self.getStringRepresentation()
+    def _refresh_current_hash(self):
+        """Combine the position hash with the side to move and the ko point
+        """
+        h = self.position_hash
+        if self.current_player == WHITE:
+            h ^= self.side_key
+        if self.ko is not None:
+            (x, y) = self.ko
+            h ^= self.ko_lookup[x][y]
+        self.current_hash = h
+
+    def get_score_key(self):
+        """Key of everything the score of this position depends on: the stones, side
+        to move and ko point (current_hash), the color orientation of self.pieces and
+        whether the dead stone analysis applies (more than 10 moves played).
+        None if the score also depends on the earlier positions, which is the case
+        for the dead stone playouts under positional superko
+        """
+        dead_stone_analysis = len(self.history) > 10
+        if self.enforce_superko and dead_stone_analysis:
+            return None
+        return (self.n, self.current_hash, self._hash_color_sign, self.komi, dead_stone_analysis)
+
+    def get_state_key(self):
+        """64-bit key of the game state: the position, side to move and ko point (current_hash)
+        combined with the moves that led to it (history_hash). It tells apart what the move
+        history tells apart, updated with every move instead of rebuilt from the history
+        """
+        return self.current_hash ^ self.history_hash
+
+    def get_transposition_key(self):
+        """64-bit key of what the search can see of the game state: the position, side to
+        move and ko point (current_hash), the number of moves played (pass rule, move limit
+        and scoring depend on it) and the positions of the network's history planes.
+        Unlike get_state_key, the same position reached by different move orders gets the
+        same key once the moves that differ have left the history planes. Under positional
+        superko the legal moves depend on every earlier position, so it is get_state_key
+        """
+        if self.enforce_superko:
+            return self.get_state_key()
+        return hash((self.current_hash, len(self.history),
+                     *self.position_hashes[-(HISTORY_LENGTH - 1):]))
+
+    def _captured_groups(self, action, color):
+        """Return the opponent groups that would be captured if color played at action
+        """
+        groups = []
+        for (nx, ny) in self._neighbors(action):
+            if self.pieces[nx][ny] == -color:
+                liberties = self.liberty_sets[nx][ny]
+                group = self.group_sets[nx][ny]
+                if len(liberties) == 1 and action in liberties and not any(g is group for g in groups):
+                    groups.append(group)
+        return groups
 
     def _remove_group(self, group):
 
@@ -304,15 +398,13 @@ class Board:
         updating group sets and liberties along the way
         """
         for (x, y) in group:
-            # self._update_hash((x, y), self.pieces[x, y])
-            self._update_current_board((x, y), self.pieces[x, y])
+            self._update_hash((x, y), self.pieces[x, y])
             self.pieces[x, y] = EMPTY
         for (x, y) in group:
             # clear group_sets for all positions in 'group'
             self.group_sets[x][y] = set()
             self.liberty_sets[x][y] = set()
             self.liberty_counts[x][y] = -1
-            self.stone_ages[x][y] = -1
             for (nx, ny) in self._neighbors((x, y)):
                 if self.pieces[nx, ny] == EMPTY:
                     # add empty neighbors of (x,y) to its liberties
@@ -334,14 +426,16 @@ class Board:
         other.num_black_prisoners = self.num_black_prisoners
         other.num_white_prisoners = self.num_white_prisoners
         other.enforce_superko = self.enforce_superko
-        # other.current_hash = self.current_hash.copy()
-        # other.previous_hashes = self.previous_hashes.copy()
-        other.previous_boards = self.previous_boards
-        other.current_board = self.current_board
-        other.x_boards = self.x_boards.copy()
-        other.y_boards = self.y_boards.copy()
+        other._hash_color_sign = self._hash_color_sign
+        other.position_hash = self.position_hash
+        other.current_hash = self.current_hash
+        other.history_hash = self.history_hash
+        other.previous_hashes = set(self.previous_hashes)
+        other.position_hashes = list(self.position_hashes)
+        other.features = self.features.copy()
+        other.ladder_features = self.ladder_features
+        other._ladder_cache = self._ladder_cache
         other.current_player = self.current_player
-        other.canonical_history = self.canonical_history
 
         # update liberty and group sets.
         #
@@ -349,7 +443,10 @@ class Board:
         # group.  We need to make sure this is the case in the copy, as well.
         #
         # we store set copies indexed by original id() in set_copies
-        def get_copy(s, set_copies={}):
+        # (local to this call, ids are only unique among live objects)
+        set_copies = {}
+
+        def get_copy(s):
             if id(s) not in set_copies:
                 set_copies[id(s)] = set(s)  # makes a copy of s
             return set_copies[id(s)]
@@ -361,6 +458,14 @@ class Board:
         other.liberty_counts = self.liberty_counts.copy()
         return other
 
+    def invert_colors(self):
+        """Swap black and white stones in place (used to build canonical boards)
+        """
+        self.pieces = np.where(self.pieces == 1, -1, np.where(self.pieces == -1, 1, self.pieces))
+        # hashes stay in absolute colors so they remain comparable with previous_hashes
+        self._hash_color_sign = -self._hash_color_sign
+        self._clear_caches()
+
     def is_suicide(self, action, color):
         """return true if having this color play at <action> would be suicide
         """
@@ -385,34 +490,17 @@ class Board:
         return False
 
     def is_positional_superko(self, action, color):
-        """Find all actions that this color player has done in the past, taking into
-        account the fact that history starts with BLACK when there are no
-        handicaps or with WHITE when there are.
-        """
-        if len(self.handicaps) == 0 and color == BLACK:
-            player_history = self.history[0::2]
-        elif len(self.handicaps) > 0 and color == WHITE:
-            player_history = self.history[0::2]
-        else:
-            player_history = self.history[1::2]
-
-        if action not in self.handicaps and action not in player_history:
-            return False
-
-        state_copy = self.copy()
-        state_copy.enforce_superko = False
-        state_copy.execute_move(action, color)
-
+        """Return true if playing color at action would recreate an earlier position.
+        The resulting position hash is derived from the current one and the stones
+        that would be captured, so no copy of the board is needed.
         """
-        if state_copy.current_hash in self.previous_hashes:
-            return True
-        else:
-            return False"""
-
-        if state_copy.current_board in self.previous_boards:
-            return True
-        else:
-            return False
+        (x, y) = action
+        sign = self._hash_color_sign
+        next_hash = self.position_hash ^ self.hash_lookup[color * sign][x][y]
+        for group in self._captured_groups(action, color):
+            for (gx, gy) in group:
+                next_hash ^= self.hash_lookup[-color * sign][gx][gy]
+        return next_hash in self.previous_hashes
 
     def is_legal(self, action, color):
         """determine if the given action (x,y tuple) is a legal move
@@ -445,11 +533,13 @@ class Board:
                 return False
         return True
 
-    def is_eye(self, position, owner, stack=[]):
+    def is_eye(self, position, owner, stack=None):
         """returns whether the position is a true eye of 'owner'
         Requires a recursive call; empty spaces diagonal to 'position' are fine
         as long as they themselves are eyes
         """
+        if stack is None:
+            stack = []
         if not self.is_eyeish(position, owner):
             return False
         # (as in Fuego/Michi/etc) ensure that num "bad" diagonals is 0 (edges) or 1
@@ -475,6 +565,88 @@ class Board:
                 return False
         return True
 
+    def get_eyes(self, owner):
+        """Boolean array over the flattened board marking the true eyes of 'owner',
+        same result as is_eye() on every point. The 3x3 pattern of each point is
+        looked up in the eye table, is_eye() is only called for the rare points
+        whose verdict depends on an empty diagonal that is eye-shaped itself
+        """
+        nn = self.n * self.n
+        # cell class of every point seen from owner, plus the off-board cell
+        cells = np.full(nn + 1, CELL_OFF_BOARD, dtype=np.intp)
+        cells[:nn] = CELL_CLASSES[(self.pieces.ravel() * owner).astype(np.intp) + 1]
+        surround = cells[self._surround_index]
+        codes = surround @ CELL_WEIGHTS
+        verdicts = np.where(cells[:nn] == CELL_EMPTY, self._eye_verdicts[codes], NOT_EYE)
+        eyes = verdicts == EYE
+
+        check = np.flatnonzero(verdicts == EYE_CHECK_DIAGONALS)
+        if check.size:
+            # every point that did not get NOT_EYE is eye-shaped
+            eyeish = np.append(verdicts != NOT_EYE, False)
+            diagonal_index = self._surround_index[check, 4:]
+            diagonal = surround[check, 4:]
+            empty_eyeish = (diagonal == CELL_EMPTY) & eyeish[diagonal_index]
+            bad = ((diagonal == CELL_OPPONENT) | ((diagonal == CELL_EMPTY) & ~eyeish[diagonal_index])).sum(axis=1)
+            possible = bad <= self._eye_allowed[codes[check]]
+            eyes[check[possible & ~empty_eyeish.any(axis=1)]] = True
+            for p in check[possible & empty_eyeish.any(axis=1)]:
+                eyes[p] = self.is_eye((p // self.n, p % self.n), owner)
+        return eyes
+
+    def get_region_borders(self):
+        """Int8 array over the flattened board giving, for every empty point, the
+        colors of the stones bordering its connected empty region: BORDERS_BLACK
+        for stones of value +1 in self.pieces, BORDERS_WHITE for -1, both, or 0
+        for a region that touches no stone. Stones get 0.
+        The empty regions are labeled with one pass over the points, the colors
+        around each point are gathered through the neighbor index and or-ed per region
+        """
+        nn = self.n * self.n
+        flat = self.pieces.ravel()
+        stone_bits = np.zeros(nn + 1, dtype=np.int8)
+        stone_bits[:nn][flat == BLACK] = BORDERS_BLACK
+        stone_bits[:nn][flat == WHITE] = BORDERS_WHITE
+        point_borders = np.bitwise_or.reduce(stone_bits[self._neighbor_index], axis=1)
+
+        empty = flat == EMPTY
+        is_empty = empty.tolist()
+        neighbor_points = self.geometry.neighbor_points
+        labels = [-1] * nn
+        num_regions = 0
+        for p in np.flatnonzero(empty).tolist():
+            if labels[p] >= 0:
+                continue
+            labels[p] = num_regions
+            frontier = [p]
+            while frontier:
+                for q in neighbor_points[frontier.pop()]:
+                    if is_empty[q] and labels[q] < 0:
+                        labels[q] = num_regions
+                        frontier.append(q)
+            num_regions += 1
+
+        labels = np.array(labels, dtype=np.intp)
+        region_borders = np.zeros(num_regions, dtype=np.int8)
+        np.bitwise_or.at(region_borders, labels[empty], point_borders[empty])
+        borders = np.zeros(nn, dtype=np.int8)
+        borders[empty] = region_borders[labels[empty]]
+        return borders
+
+    def _ladder_key(self, kind, action, color, prey, remaining_attempts):
+        """Memo key of a ladder reading: the position (current_hash covers the
+        stones, the side to move and ko), the move, and the prey group identified
+        by its smallest stone
+        """
+        prey_key = None if prey is None else min(self.get_group(prey))
+        return (self.current_hash, kind, action, color, prey_key, remaining_attempts)
+
+    def _remember_ladder(self, key, result):
+        if len(self._ladder_cache) >= LADDER_CACHE_SIZE:
+            self._ladder_cache.clear()
+        self._ladder_cache[key] = result
+        return result
+
     def is_ladder_capture(self, action, color, prey=None, remaining_attempts=80):
 
         """Check if moving at action results in a ladder capture, defined as being next
@@ -486,6 +658,8 @@ class Board:
         Recursion depth between is_ladder_capture() and is_ladder_escape() is
         controlled by the remaining_attempts argument.  If it reaches 0, the
         move is assumed not to be a ladder capture.
+        The moves are read on this board with play()/undo() and results are
+        memoized per position hash and prey group.
         """
 
         # ignore illegal moves
@@ -496,6 +670,10 @@ class Board:
         if remaining_attempts <= 0:
             return True
 
+        key = self._ladder_key('capture', action, color, prey, remaining_attempts)
+        if key in self._ladder_cache:
+            return self._ladder_cache[key]
+
         hunter_player = color
         prey_player = - color
 
@@ -505,37 +683,41 @@ class Board:
             neighbor_groups_stones = [next(iter(group)) for group in self.get_groups_around(action)]
             potential_prey = [(nx, ny) for (nx, ny) in neighbor_groups_stones
                               if (self.pieces[nx][ny] == prey_player and
-                                  self.liberty_counts[nx][ny] == 2)]
+                                  len(self.get_liberties((nx, ny))) == 2)]
         else:
             # we are checking a specific group (called from is_ladder_escape)
             potential_prey = [prey]
 
         for (prey_x, prey_y) in potential_prey:
             # attempt to capture the group at prey_x, prey_y in a ladder
-            tmp = self.copy()
-            tmp.execute_move(action, color)
-
-            # we only want to check a limited set of possible escape moves:
-            # - extensions from the remaining liberty of the prey group.
-            # - captures of enemy groups adjacent to the prey group.
-            possible_escapes = tmp.liberty_sets[prey_x][prey_y].copy()
-
-            # Check if any hunter groups adjacent to the prey groups
-            # are in atari.  Capturing these groups are potential escapes.
-            for prey_stone in tmp.group_sets[prey_x][prey_y]:
-                for (nx, ny) in tmp._neighbors(prey_stone):
-                    if (tmp.pieces[nx][ny] == hunter_player) and (tmp.liberty_counts[nx][ny] == 1):
-                        possible_escapes |= tmp.liberty_sets[nx][ny]
-
-            if not any(tmp.is_ladder_escape((escape_x, escape_y), color, prey=(prey_x, prey_y),
-                                            remaining_attempts=(remaining_attempts - 1))
-                       for (escape_x, escape_y) in possible_escapes):
+            self.play(action, color, trusted=True)
+            try:
+                # we only want to check a limited set of possible escape moves:
+                # - extensions from the remaining liberty of the prey group.
+                # - captures of enemy groups adjacent to the prey group.
+                # (copied, the recursion below changes the board's liberty sets)
+                possible_escapes = set(self.get_liberties((prey_x, prey_y)))
+
+                # Check if any hunter groups adjacent to the prey groups
+                # are in atari.  Capturing these groups are potential escapes.
+                for prey_stone in self.get_group((prey_x, prey_y)):
+                    for (nx, ny) in self._neighbors(prey_stone):
+                        if (self.pieces[nx][ny] == hunter_player) and (len(self.get_liberties((nx, ny))) == 1):
+                            possible_escapes |= self.get_liberties((nx, ny))
+
+                # the escapes are played by the prey
+                captured = not any(self.is_ladder_escape((escape_x, escape_y), prey_player, prey=(prey_x, prey_y),
+                                                         remaining_attempts=(remaining_attempts - 1))
+                                   for (escape_x, escape_y) in possible_escapes)
+            finally:
+                self.undo()
+            if captured:
                 # we found at least one group that could be captured in a
                 # ladder, so this move is a ladder capture.
-                return True
+                return self._remember_ladder(key, True)
 
         # no ladder captures were found
-        return False
+        return self._remember_ladder(key, False)
 
     def is_ladder_escape(self, action, color, prey=None, remaining_attempts=80):
         """Check if moving at action results in a ladder escape, defined as being next
@@ -548,6 +730,8 @@ class Board:
         Recursion depth between is_ladder_capture() and is_ladder_escape() is
         controlled by the remaining_attempts argument.  If it reaches 0, the
         move is assumed not to be a ladder capture.
+        The moves are read on this board with play()/undo() and results are
+        memoized per position hash and prey group.
         """
 
         # ignore illegal moves
@@ -558,6 +742,10 @@ class Board:
         if remaining_attempts <= 0:
             return False
 
+        key = self._ladder_key('escape', action, color, prey, remaining_attempts)
+        if key in self._ladder_cache:
+            return self._ladder_cache[key]
+
         prey_player = color
 
         if prey is None:
@@ -566,7 +754,7 @@ class Board:
             neighbor_groups_stones = [next(iter(group)) for group in self.get_groups_around(action)]
             potential_prey = [(nx, ny) for (nx, ny) in neighbor_groups_stones
                               if (self.pieces[nx][ny] == prey_player and
-                                  self.liberty_counts[nx][ny] == 1)]
+                                  len(self.get_liberties((nx, ny))) == 1)]
         else:
             # we are checking a specific group (called from is_ladder_capture)
             potential_prey = [prey]
@@ -577,31 +765,52 @@ class Board:
             # defined as having >= 3 liberties, or 2 liberties and not
             # ladder_capture() being true when played on either of those
             # liberties.
-            tmp = self.copy()
-            tmp.execute_move(action, color)
-
-            # if we have >= 3 liberties, we've escaped
-            if tmp.liberty_counts[prey_x][prey_y] >= 3:
-                return True
-
-            # if we only have 1 liberty, we've failed
-            if tmp.liberty_counts[prey_x][prey_y] == 1:
-                # not an escape - check next group
-                continue
+            self.play(action, color, trusted=True)
+            try:
+                prey_liberties = set(self.get_liberties((prey_x, prey_y)))
+                # if we have >= 3 liberties, we've escaped
+                # if we only have 1 liberty, we've failed
+                # with two liberties the group may still be in a ladder, check
+                # both liberties (played by the hunter) to see if they are ladder captures
+                escaped = len(prey_liberties) >= 3 or (
+                    len(prey_liberties) == 2 and
+                    not any(self.is_ladder_capture(possible_capture, -color, prey=(prey_x, prey_y),
+                                                   remaining_attempts=(remaining_attempts - 1))
+                            for possible_capture in prey_liberties))
+            finally:
+                self.undo()
+            if escaped:
+                return self._remember_ladder(key, True)
 
-            # The current group has two liberties.  It may still be in a ladder.
-            # Check both liberties to see if they are ladder captures
-            if any(tmp.is_ladder_capture(possible_capture, color, prey=(prey_x, prey_y),
-                                         remaining_attempts=(remaining_attempts - 1))
-                   for possible_capture in tmp.liberty_sets[prey_x][prey_y]):
-                # not an escape - check next group
-                continue
+        # no ladder escape found
+        return self._remember_ladder(key, False)
 
-            # reached two liberties that were no longer ladder-capturable
-            return True
+    def _group_liberties(self, color, num_liberties):
+        """Union of the liberties of all groups of color with exactly num_liberties liberties
+        """
+        points = set()
+        for (x, y) in zip(*np.where((self.pieces == color) & (self.liberty_counts == num_liberties))):
+            points |= self.liberty_sets[x][y]
+        return points
 
-        # no ladder escape found
-        return False
+    def get_ladder_planes(self):
+        """
+        Make the 'ladder capture' and 'ladder escape' planes, optional inputs to the NNet
+        Returns a 2xNxN float32 array marking the moves of the current player that
+        capture an opposing group in a ladder, and the moves that get one of its own
+        groups in atari out of a ladder
+        """
+        color = self.get_current_color()
+        planes = np.zeros((2, self.n, self.n), dtype=np.float32)
+        # a ladder capture has to take a liberty of a group with two, an escape
+        # has to extend from the last liberty of a group in atari
+        for action in self._group_liberties(-color, 2):
+            if self.is_ladder_capture(action, color):
+                planes[0][action] = 1
+        for action in self._group_liberties(color, 1):
+            if self.is_ladder_escape(action, color):
+                planes[1][action] = 1
+        return planes
 
     def place_handicaps(self, actions):
         if len(self.history) > 0:
@@ -610,14 +819,53 @@ class Board:
         for action in actions:
             self.execute_move(action, BLACK)
         self.history = []
+        self.history_hash = 0
+        self.position_hashes = []
+
+    def _legal_points(self, color):
+        """Boolean array over the flattened board marking the legal moves of color.
+        A point is legal if it is empty, not the ko point and either has an empty
+        neighbor, touches a friendly group with another liberty or captures a
+        neighboring enemy group in atari, all read from the cached liberty counts.
+        """
+        nn = self.n * self.n
+        # one extra off-board cell (value 2, no liberties) for the padded neighbor slots
+        colors = np.append(self.pieces.ravel(), 2)
+        liberties = np.append(self.liberty_counts.ravel(), 0)
+        neighbor_colors = colors[self._neighbor_index]
+        neighbor_liberties = liberties[self._neighbor_index]
+        legal = (colors[:nn] == EMPTY) & (
+            (neighbor_colors == EMPTY).any(axis=1) |
+            ((neighbor_colors == color) & (neighbor_liberties > 1)).any(axis=1) |
+            ((neighbor_colors == -color) & (neighbor_liberties == 1)).any(axis=1))
+        return self._filter_ko(legal, color)
+
+    def _filter_ko(self, legal, color):
+        if self.ko is not None:
+            (x, y) = self.ko
+            legal[x * self.n + y] = False
+        if self.enforce_superko:
+            for p in np.flatnonzero(legal):
+                if self.is_positional_superko((p // self.n, p % self.n), color):
+                    legal[p] = False
+        return legal
+
+    def get_legal_mask(self, allow_pass=True):
+        """Legal moves of the current player as an int8 vector of length n * n + 1
+        (the last entry is pass). The array is cached on the board until the next
+        move and shared between callers, so it is read-only.
+        """
+        mask = self._legal_masks.get(allow_pass)
+        if mask is None:
+            mask = np.zeros(self.n * self.n + 1, dtype=np.int8)
+            mask[:-1] = self._legal_points(self.get_current_color())
+            mask[-1] = 1 if allow_pass else 0
+            mask.flags.writeable = False
+            self._legal_masks[allow_pass] = mask
+        return mask
 
     def get_legal_moves(self, color):
-        moves = set()  # stores the legal moves.
-        for y in range(self.n):
-            for x in range(self.n):
-                if self.is_legal((x, y), color):
-                    moves.add((x, y))
-        return list(moves)
+        return [(p // self.n, p % self.n) for p in np.flatnonzero(self._legal_points(color))]
 
     def has_legal_moves(self, color):
         """Returns True if has legal move else False
@@ -628,87 +876,291 @@ class Board:
                     return True;
         return False
     
-    def _update_canonical_history(self):
-        history_temp = []
-        canonical_board = np.where(self.pieces != 0, self.pieces * self.current_player, 0)
-        # new_x = np.copy(canonical_board)
-        new_x = np.where(canonical_board == 1, float(1), float(0))
-        self.x_boards.append(new_x)
-        new_y = np.where(canonical_board == -1, float(1), float(0))
-        self.y_boards.append(new_y)
-
-        # Remove the oldest board state from history
-        self.x_boards = self.x_boards[1:]
-        self.y_boards = self.y_boards[1:]
-
-        for i in range(len(self.x_boards) - 1, -1, -1):
-            history_temp.append(self.x_boards[i])
-            history_temp.append(self.y_boards[i])
-        history_temp.append(self.make_sensibility_layer())
-        if self.current_player == 1:
-            history_temp.append(np.ones((self.n, self.n)))
-            history_temp.append(np.zeros((self.n, self.n)))
+    def _place_stone(self, action, color):
+        """Put a stone of `color` at `action`, take any captured groups off the
+        board and set ko. Returns the list of captured groups
+        """
+        (x, y) = action
+        self.pieces[x][y] = color
+        self._update_hash(action, color)
+        self._update_neighbors(action, color)
+
+        captured_groups = []
+        # check neighboring groups' liberties for captures
+        for (nx, ny) in self._neighbors(action):
+            if self.pieces[nx][ny] == -color and len(self.liberty_sets[nx][ny]) == 0:
+                # capture occurred!
+                captured_group = self.group_sets[nx][ny]
+                captured_groups.append(captured_group)
+                self._remove_group(captured_group)
+                # check for ko
+                if len(captured_group) == 1:
+                    # it is a ko iff, were the opponent to play at the captured position,
+                    # it would recapture (x,y) only
+                    # (a bigger group containing xy may be captured - this is 'snapback')
+                    would_recapture = len(self.liberty_sets[x][y]) == 1
+                    recapture_size_is_1 = len(self.group_sets[x][y]) == 1
+                    if would_recapture and recapture_size_is_1:
+                        # note: (nx,ny) is the stone that was captured
+                        self.ko = (nx, ny)
+        return captured_groups
+
+    def _unplace_stone(self, action, color, captured_groups):
+        """Reverse of _place_stone: lift the stone at `action`, put the captured
+        groups back and rebuild the group/liberty sets around them
+        """
+        (x, y) = action
+        self.pieces[x][y] = EMPTY
+        affected = {action}
+        affected.update(self._neighbors(action))
+        for group in captured_groups:
+            for (gx, gy) in group:
+                self.pieces[gx][gy] = -color
+                affected.add((gx, gy))
+                affected.update(self._neighbors((gx, gy)))
+        self._rebuild_groups(affected)
+
+    def _rebuild_groups(self, positions):
+        """Recompute group_sets, liberty_sets and liberty_counts from `pieces` for
+        the given positions and every group touching them
+        """
+        visited = set()
+        for position in positions:
+            if position in visited:
+                continue
+            (x, y) = position
+            if self.pieces[x][y] == EMPTY:
+                visited.add(position)
+                self.group_sets[x][y] = set()
+                self.liberty_sets[x][y] = set(xy for xy in self._neighbors(position) if self.pieces[xy] == EMPTY)
+                self.liberty_counts[x][y] = -1
+                continue
+            color = self.pieces[x][y]
+            group = {position}
+            liberties = set()
+            frontier = [position]
+            while frontier:
+                for (nx, ny) in self._neighbors(frontier.pop()):
+                    if self.pieces[nx][ny] == EMPTY:
+                        liberties.add((nx, ny))
+                    elif self.pieces[nx][ny] == color and (nx, ny) not in group:
+                        group.add((nx, ny))
+                        frontier.append((nx, ny))
+            for (gx, gy) in group:
+                self.group_sets[gx][gy] = group
+                self.liberty_sets[gx][gy] = liberties
+                self.liberty_counts[gx][gy] = len(liberties)
+            visited |= group
+
+    def _apply_move(self, action, color):
+        """Play `action` for `color` without checking legality and return a
+        MoveRecord holding everything needed to take the move back
+        """
+        record = MoveRecord(action, color, self)
+        self._clear_caches()
+        # reset ko
+        self.ko = None
+        # increment age of stones by 1
+        self.stone_ages[self.stone_ages >= 0] += 1
+        if action is not PASS_MOVE:
+            (x, y) = action
+            captured_groups = self._place_stone(action, color)
+            self.stone_ages[x][y] = 0
+            for group in captured_groups:
+                record.captured.append((group, [self.stone_ages[gx][gy] for (gx, gy) in group]))
+                for (gx, gy) in group:
+                    self.stone_ages[gx][gy] = -1
+                if color == BLACK:
+                    self.num_white_prisoners += len(group)
+                else:
+                    self.num_black_prisoners += len(group)
+            # _remove_group has finished updating the hash
+            record.hash_added = self.position_hash not in self.previous_hashes
+            self.previous_hashes.add(self.position_hash)
         else:
-            history_temp.append(np.zeros((self.n, self.n)))
-            history_temp.append(np.ones((self.n, self.n)))
-        self.canonical_history = history_temp
+            if color == BLACK:
+                self.passes_black += 1
+            if color == WHITE:
+                self.passes_white += 1
+        self.history_hash ^= self._history_key(len(self.history), action)
+        self.history.append(action)
+        self.position_hashes.append(record.position_hash)
+        # A new move has been played, so update variables to reflect the NEW current player
+        self.current_player = -1 * self.current_player
+        self._refresh_current_hash()
+        record.evicted_frame = self.features.push(self.pieces, self._hash_color_sign)
+        return record
+
+    def _revert_move(self, record):
+        self._clear_caches()
+        self.features.pop(record.evicted_frame)
+        action = record.action
+        if action is not PASS_MOVE:
+            (x, y) = action
+            if record.hash_added:
+                self.previous_hashes.discard(self.position_hash)
+            self._unplace_stone(action, record.color, [group for (group, _) in record.captured])
+            self.stone_ages[x][y] = -1
+            for (group, ages) in record.captured:
+                for ((gx, gy), age) in zip(group, ages):
+                    self.stone_ages[gx][gy] = age
+        self.stone_ages[self.stone_ages >= 0] -= 1
+        self.history.pop()
+        self.position_hashes.pop()
+        record.restore(self)
+
+    def play(self, action, color=None, trusted=False):
+        """Play a move in place, recording what is needed to undo() it.
+        color is the value of the stones to play in self.pieces and defaults to the
+        current player's (see get_current_color). With trusted=True the legality
+        check is skipped, only use it for moves already known to be legal
+        (e.g. taken from a valid moves vector computed for this position).
+        """
+        if color is None:
+            color = self.get_current_color()
+        if not trusted and not self.is_legal(action, color):
+            raise IllegalMove(str(action) + ',' + str(color))
+        self.move_stack.append(self._apply_move(action, color))
 
+    def undo(self):
+        """Take back the last move made with play()
+        """
+        self._revert_move(self.move_stack.pop())
 
     def execute_move(self, action, color):
         """Perform the given move on the board; flips pieces as necessary.
         color gives the color pf the piece to play (-1=white,1=black)
         """
         if self.is_legal(action, color):
-            # reset ko
-            self.ko = None
-            # increment age of stones by 1
-            self.stone_ages[self.stone_ages >= 0] += 1
-            if action is not PASS_MOVE:
-                (x, y) = action
-                self.pieces[x][y] = color
-                # self._update_hash(action, color)
-                self._update_current_board(action, color)
-                self._update_neighbors(action, color)
-                self.stone_ages[x][y] = 0
-                # print("player {} act {} --:".format(color,action))
-
-                # check neighboring groups' liberties for captures
-                for (nx, ny) in self._neighbors(action):
-                    if self.pieces[nx][ny] == -color and len(self.liberty_sets[nx][ny]) == 0:
-                        # capture occurred!
-                        captured_group = self.group_sets[nx][ny]
-                        num_captured = len(captured_group)
-                        self._remove_group(captured_group)
-                        if color == BLACK:
-                            self.num_white_prisoners += num_captured
-                        else:
-                            self.num_black_prisoners += num_captured
-                        # check for ko
-                        if num_captured == 1:
-                            # it is a ko iff, were the opponent to play at the captured position,
-                            # it would recapture (x,y) only
-                            # (a bigger group containing xy may be captured - this is 'snapback')
-                            would_recapture = len(self.liberty_sets[x][y]) == 1
-                            recapture_size_is_1 = len(self.group_sets[x][y]) == 1
-                            if would_recapture and recapture_size_is_1:
-                                # note: (nx,ny) is the stone that was captured
-                                self.ko = (nx, ny)
-                # _remove_group has finished updating the hash
-                # self.previous_hashes.add(self.current_hash)
-                self.previous_boards.append(self.current_board)
-            else:
-                if color == BLACK:
-                    self.passes_black += 1
-                if color == WHITE:
-                    self.passes_white += 1
-            self.history.append(action)
-            # A new move has been played, so update variables to reflect the NEW current player
-            self.current_player = -1 * self.current_player
-            self.x_boards, self.y_boards = self.y_boards, self.x_boards
-            self._update_canonical_history()
+            self._apply_move(action, color)
         else:
             raise IllegalMove(str(action) + ',' + str(color))
 
 
+class MoveRecord:
+    """
+    Compact record of a move made with Board.play(): the move itself, the groups it
+    captured (with their stone ages), the scalar state from before the move and the
+    history frame the feature encoder dropped.
+    """
+    __slots__ = ('action', 'color', 'captured', 'hash_added', 'ko', 'current_player',
+                 'num_black_prisoners', 'num_white_prisoners', 'passes_black', 'passes_white',
+                 'position_hash', 'current_hash', 'history_hash', 'evicted_frame')
+
+    def __init__(self, action, color, board):
+        self.action = action
+        self.color = color
+        self.captured = []
+        self.hash_added = False
+        self.ko = board.ko
+        self.current_player = board.current_player
+        self.num_black_prisoners = board.num_black_prisoners
+        self.num_white_prisoners = board.num_white_prisoners
+        self.passes_black = board.passes_black
+        self.passes_white = board.passes_white
+        self.position_hash = board.position_hash
+        self.current_hash = board.current_hash
+        self.history_hash = board.history_hash
+        self.evicted_frame = None
+
+    def restore(self, board):
+        board.ko = self.ko
+        board.current_player = self.current_player
+        board.num_black_prisoners = self.num_black_prisoners
+        board.num_white_prisoners = self.num_white_prisoners
+        board.passes_black = self.passes_black
+        board.passes_white = self.passes_white
+        board.position_hash = self.position_hash
+        board.current_hash = self.current_hash
+        board.history_hash = self.history_hash
+
+
+class CanonicalView:
+    """
+    A board seen from the perspective of `player`: the stones of `player` read as +1.
+    Nothing is copied, the view shares the storage of the board (so it follows any
+    move played on it afterwards) and flips colors on access. Methods that take a
+    color are translated to the board's colors, as are the ones that return colors
+    (get_region_borders, get_current_color) or depend on them (get_score_key,
+    _hash_color_sign). Everything else (history, current_player, hashes, features,
+    ...) is read from the board unchanged, as on a board copy with inverted colors.
+    """
+    __slots__ = ('board', 'player')
+
+    def __init__(self, board, player):
+        self.board = board
+        self.player = player
+
+    @property
+    def pieces(self):
+        if self.player == BLACK:
+            return self.board.pieces
+        return -self.board.pieces
+
+    def __getitem__(self, index):
+        return self.pieces[index]
+
+    def __getattr__(self, name):
+        return getattr(self.board, name)
+
+    @property
+    def _hash_color_sign(self):
+        return self.board._hash_color_sign * self.player
+
+    def get_region_borders(self):
+        borders = self.board.get_region_borders()
+        if self.player == BLACK:
+            return borders
+        # swap the BORDERS_BLACK and BORDERS_WHITE bits
+        return ((borders & BORDERS_BLACK) * BORDERS_WHITE + (borders & BORDERS_WHITE) // BORDERS_WHITE).astype(np.int8)
+
+    def get_score_key(self):
+        # the board's key, computed with the view's color orientation
+        return type(self.board).get_score_key(self)
+
+    def get_current_color(self):
+        return self.board.get_current_color() * self.player
+
+    def play(self, action, color=None, trusted=False):
+        if color is not None:
+            color *= self.player
+        self.board.play(action, color, trusted)
+
+    def is_legal(self, action, color):
+        return self.board.is_legal(action, color * self.player)
+
+    def is_suicide(self, action, color):
+        return self.board.is_suicide(action, color * self.player)
+
+    def get_legal_moves(self, color):
+        return self.board.get_legal_moves(color * self.player)
+
+    def has_legal_moves(self, color):
+        return self.board.has_legal_moves(color * self.player)
+
+    def is_eyeish(self, position, owner):
+        return self.board.is_eyeish(position, owner * self.player)
+
+    def is_eye(self, position, owner):
+        return self.board.is_eye(position, owner * self.player)
+
+    def get_eyes(self, owner):
+        return self.board.get_eyes(owner * self.player)
+
+    def is_ladder_capture(self, action, color, prey=None, remaining_attempts=80):
+        return self.board.is_ladder_capture(action, color * self.player, prey, remaining_attempts)
+
+    def is_ladder_escape(self, action, color, prey=None, remaining_attempts=80):
+        return self.board.is_ladder_escape(action, color * self.player, prey, remaining_attempts)
+
+    def copy(self):
+        """Materialize the view as an independent board with inverted colors
+        """
+        other = self.board.copy()
+        if self.player == WHITE:
+            other.invert_colors()
+        return other
+
+
 class IllegalMove(Exception):
     pass
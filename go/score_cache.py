@@ -0,0 +1,19 @@
+from utils.lru_cache import LRUCache
+
+'''
+Score cache.
+Bounded least recently used cache of position scores (see utils/lru_cache.py).
+One instance is shared by every GoGame in the process (see get_score_cache), so
+both arena players and consecutive self play games reuse each other's scores.
+Keys come from Board.get_score_key, values are what GoGame.getScoreAndOwnership
+returns.
+'''
+SCORE_CACHE_SIZE = 100000
+
+_SCORE_CACHE = LRUCache(SCORE_CACHE_SIZE)
+
+
+def get_score_cache():
+    """The score cache shared by the whole process
+    """
+    return _SCORE_CACHE
@@ -323,14 +323,15 @@ def generate_move(color):
 
     board = game.getNextState(board, action)
 
-    if action == 49:
+    if action == game.geometry.pass_action:
         coordinate = "pass"
         row = "Z"
         col = "Z"
     else:
-        row = config["board_size"] - int(action / config["board_size"])
+        (x, y) = game.geometry.to_position(action)
+        row = config["board_size"] - x
         col_coords = ['A', 'B', 'C', 'D', 'E', 'F', 'G', 'H', 'I', 'J', 'K', 'L', 'M', 'N', 'O', 'P']
-        col = col_coords[action % 7]
+        col = col_coords[y]
         coordinate = col + str(row)
 
     if not os.path.exists("Engine_Debug.txt"):
@@ -133,7 +133,8 @@ class MCTS:
                 self.Ps[s][player] = self.Ps[s][player] + valids
                 self.Ps[s][player] /= np.sum(self.Ps[s][player])
 
-            self.Vs[s][player] = valids
+            # getValidMoves returns the board's read-only mask, keep a copy we can edit below
+            self.Vs[s][player] = valids.copy()
             self.Ns[s][player] = 0
             return -v
 
@@ -141,7 +142,7 @@ class MCTS:
         # Check if ko changed between first time board state 's' is encountered
         # and subsequent encounters throughout MCTS
         if board.ko is not None:
-            invalid = board.ko[0]*7 + board.ko[1]
+            invalid = self.game.geometry.to_action(board.ko)
             valids[invalid] = 0
         cur_best = -float('inf')
         best_act = -1
@@ -207,11 +208,7 @@ class MCTS:
         pi, v = self.nnet.predict(nnet_input)
 
         # policy need to rotate and flip back
-        pi_board = np.reshape(pi[:-1], (self.game.n, self.game.n))
-        if r >= 4:
-            pi_board = np.fliplr(pi_board)
-        pi_board = np.rot90(pi_board, 4 - r % 4)
-        p = list(pi_board.ravel()) + [pi[-1]]
+        p = pi[self.game.geometry.inverse_symmetries[r]]
 
         return p, v
     
@@ -8,7 +8,7 @@ class NeuralNetManager:
 
     def __init__(self):
         self.config = ConfigHandler(CONFIG_PATH)
-        self.go_game = GoGame(self.config["board_size"])
+        self.go_game = GoGame(self.config["board_size"], ladder_features=self.config["use_ladder_features"])
 
         # neural networks
         self.current_net = NNetWrapper(self.go_game, self.config)
@@ -1,27 +1,55 @@
-import copy
+import heapq
 import math
-import sys
 
 import numpy as np
 
 from definitions import CONFIG_PATH
 from utils.config_handler import ConfigHandler
 
+# value added as a loss to the edges of a pending path in batched searches (see MCTS.search_batch)
+VIRTUAL_LOSS = 1.0
+# gap between the Q value of an edge and the value of the shared node behind it beyond
+# which the edge catches up instead of descending, with transpositions (see MCTS.catch_up)
+TRANSPOSITION_EPSILON = 0.01
+
+
+class Node:
+    """
+    An expanded node of the MCTS tree. The statistics of its edges are kept in
+    contiguous arrays over the legal actions of the position (in increasing order),
+    so that selection is a single NumPy expression.
+    """
+    __slots__ = ('key', 'actions', 'priors', 'value', 'visits', 'value_sums', 'visit_count', 'children')
+
+    def __init__(self, key, actions, priors, value=0.0):
+        self.key = key  # key of the board (see MCTS.get_key)
+        self.actions = actions  # legal actions, int array
+        self.priors = priors  # network policy over the legal actions, float32
+        self.value = value  # network value of the board for the player to move
+        self.visits = np.zeros(len(actions), dtype=np.float32)  # N(s, a)
+        self.value_sums = np.zeros(len(actions), dtype=np.float32)  # W(s, a), Q(s, a) = W / N
+        self.visit_count = 0  # N(s)
+        self.children = np.full(len(actions), -1, dtype=np.int32)  # node id behind each edge, -1 if not expanded
+
+    def get_counts(self, action_size):
+        """Visit counts of the edges as a full size action vector
+        """
+        counts = np.zeros(action_size, dtype=np.float32)
+        counts[self.actions] = self.visits
+        return counts
+
+    def get_value(self):
+        """Average value of the simulations through the node (its network value and the
+        values backed up through its edges) for the player to move
+        """
+        return (self.value + float(np.sum(self.value_sums))) / (1 + self.visit_count)
+
 
 class MCTS:
     """
     This class handles the MCTS tree.
     """
 
-    def get_stack_size(self):
-        size = 2  # current frame and caller's frame always exist
-        while True:
-            try:
-                sys._getframe(size)
-                size += 1
-            except ValueError:
-                return size - 1  # subtract current frame
-
     def __init__(self, game, nnet, is_self_play, config=None):
         self.game = game
         self.nnet = nnet
@@ -33,16 +61,19 @@ class MCTS:
         else:
             self.config = config
 
-        self.Qsa = {}  # stores Q values for s,a (as defined in the paper)
-        self.Nsa = {}  # stores #times edge s,a was visited
-        self.Ns = {}  # stores #times board s was visited
-        self.Ps = {}  # stores initial policy (returned by neural net)
+        self.node_ids = {}  # stores the node id of each expanded board s
+        self.nodes = []  # stores the expanded nodes (see Node), indexed by node id
         self.smartSimNum = 10 * (self.game.getBoardSize()[0] ** 2)
         self.Es = {}  # stores game.getGameEnded ended for board s
-        self.Ss = {} # stores the score for board s
-        self.Vs = {}  # stores game.getValidMoves for board s
-
-    def getActionProb(self, board, canonicalBoard, canonicalHistory, x_boards, y_boards, player_board, num_sims, temp=1):
+        # leaves evaluated together in one batched network call (see search_batch), 1 -> one at a time
+        self.batch_size = self.config["mcts_batch_size"]
+        # nodes kept between moves, the least visited subtrees are evicted beyond it (see set_root)
+        self.max_nodes = self.config["mcts_max_nodes"]
+        # key nodes by transposition (see get_key), the tree becomes a graph
+        self.transpositions = self.config["mcts_transpositions"]
+        self.root_id = None  # node id of the last search root
+
+    def getActionProb(self, board, canonicalBoard, num_sims, temp=1):
         """
         This function performs numMCTSSims simulations of MCTS starting from
         canonicalBoard.
@@ -51,13 +82,43 @@ class MCTS:
             probs: a policy vector where the probability of the ith action is
                    proportional to Nsa[(s,a)]**(1./temp)
         """
+        s = self.get_key(canonicalBoard)
+        # reuse the subtree of the position searched and free the rest of the tree
+        self.set_root(s)
+
         # removed min(num_MCTS_sims, smartsimnum)
-        for i in range(num_sims):
-            self.search(board, canonicalBoard, canonicalHistory, x_boards, y_boards, player_board, 1, True)
+        if self.batch_size > 1:
+            done = 0
+            while done < num_sims:
+                done += self.search_batch(board, min(self.batch_size, num_sims - done))
+        else:
+            for i in range(num_sims):
+                self.search(board)
 
-        s = self.game.stringRepresentation(canonicalBoard, is_canonical=True)
+        return self.get_probs(board, s, temp)
 
-        counts = np.array([self.Nsa[(s, a)] if (s, a) in self.Nsa else 0 for a in range(self.game.getActionSize())])
+    def get_key(self, board):
+        """
+        Key of the node of board. By default it is the state key, which covers the full
+        move history, so every move order gets its own node. With transpositions the
+        positions reached by different move orders that the network cannot tell apart
+        (see GoGame.getTranspositionKey) share one node and its statistics, while the
+        visits and values of the edges leading to it stay with each parent.
+        """
+        if self.transpositions:
+            return self.game.getTranspositionKey(board)
+        return self.game.getStateKey(board)
+
+    def get_probs(self, board, s, temp=1):
+        """
+        Move probabilities of board (whose key is s, see get_key) from the visit counts of
+        its node, see getActionProb
+        """
+        # visit counts straight from the root's edge arrays
+        if s in self.node_ids:
+            counts = self.nodes[self.node_ids[s]].get_counts(self.game.getActionSize())
+        else:
+            counts = np.zeros(self.game.getActionSize(), dtype=np.float32)
         valids = self.game.getValidMoves(board)
         self.smartSimNum = 10 * (np.count_nonzero(valids))
 
@@ -77,29 +138,14 @@ class MCTS:
             except:
                 print("temp=0, assert valids[bestA]!=0 !!!")
                 print("current valids:", valids)
-                flag_Qsa = False
-                flag_Nsa = False
-                if s in self.Ps:
-                    print("s in p! Which measn it's been visited, has the probability of each action", self.Ps[s])
-                for _ in range(self.game.getActionSize()):
-                    if (s, _) in self.Nsa:
-                        print(_, "in Nsa! which measn its value is calculated to ", self.Nsa[(s, _)])
-                    else:
-                        flag_Nsa = True
-                        print(_, "no Nsa value, set 0 by default in counts=[...]!")
-
-                    if (s, _) in self.Qsa:
-                        print(_, "in! Qsa with value:", self.Qsa[(s, _)])
-                    else:
-                        flag_Qsa = True
-                        print(_, "no Qsa value")
-
-                    if flag_Nsa and flag_Qsa:
-                        print("no nsa, no qsa")
-                    if flag_Nsa and not flag_Qsa:
-                        print("no nsa, has qsa")
-                    if not flag_Nsa and flag_Qsa:
-                        print("has nsa, no qsa")
+                if s in self.node_ids:
+                    node = self.nodes[self.node_ids[s]]
+                    print("root node actions:", node.actions)
+                    print("root node priors:", node.priors)
+                    print("root node visits:", node.visits)
+                    print("root node value sums:", node.value_sums)
+                else:
+                    print("root node was never expanded, counts default to 0")
 
                 # print(counts)
             # print(counts)
@@ -128,202 +174,300 @@ class MCTS:
 
         return probs * valids
 
-    def search(self, board, canonicalBoard, canonicalHistory, x_boards, y_boards, player_board, calls, is_root):
+    def search(self, board):
         """
-        This function performs one iteration of MCTS. It is recursively called
-        till a leaf node is found. The action chosen at each node is one that
-        has the maximum upper confidence bound as in the paper.
+        This function performs one iteration of MCTS. It walks down the tree from
+        board, playing the action with the maximum upper confidence bound (as in
+        the paper) at each node, until a leaf node is found (see descend).
 
         Once a leaf node is found, the neural network is called to return an
         initial policy P and a value v for the state. This value is propogated
         up the search path. In case the leaf node is a terminal state, the
-        outcome is propogated up the search path. The values of Ns, Nsa, Qsa are
-        updated.
+        outcome is propogated up the search path. The visit counts and value sums
+        of the path's edges are updated. With transpositions a path may also stop at an
+        edge that lags behind the shared node it leads to (see catch_up).
 
-        NOTE: the return values are the negative of the value of the current
-        state. This is done since v is in [-1,1] and if v is the value of a
-        state for the current player, then its value is -v for the other player.
+        NOTE: the values are negated at each step up the path. This is done since
+        v is in [-1,1] and if v is the value of a state for the current player,
+        then its value is -v for the other player.
 
-        Returns:
-            v: the negative of the value of the current canonicalBoard
+        The moves of the path are played on board and taken back before returning.
+        """
+        path = []
+        try:
+            s, value = self.descend(board, path)
+            if value is None:
+                # leaf node, add it to the tree
+                value = self.expand(board, s, path)
+        finally:
+            for _ in path:
+                self.game.undoAction(board)
+
+        v = -value
+        for node, i in reversed(path):
+            node.visits[i] += 1
+            node.value_sums[i] += v
+            node.visit_count += 1
+            v = -v
+
+    def descend(self, board, path, virtual_loss=False):
         """
+        Walk down the tree from board along the edges picked by select, playing them
+        on board and appending (node, edge index) to path, until a terminal board,
+        the depth limit or a board that has not been expanded yet. With virtual_loss
+        each edge gets a visit and a loss of VIRTUAL_LOSS on the way (see search_batch).
 
-        # check if both players passed
-        """if len(canonicalBoard.history) > 1:
-            if canonicalBoard.history[-1] is None and canonicalBoard.history[-2] is None:
-                if 1 in player_board[0]:
-                    perspective = 1
-                else:
-                    perspective = -1
-                gameEnd = self.game.getGameEndedArena(canonicalBoard, perspective)
-                # print("Ended sim with back to back passes after ", calls, " calls with reward -- ", gameEnd)
-                if gameEnd != 0:
-                    return -gameEnd
-                else:
-                    return 0"""
-        # See if game is in a terminal state
-        # NOTE: Changed string representation call!
-        # s = self.game.stringRepresentation(canonicalBoard)
-        s = self.game.stringRepresentation(canonicalBoard, is_canonical=True)
-        non_canonical_s = self.game.stringRepresentation(board, is_canonical=False)
-
-        if s not in self.Es:
-                # self.Es[s], self.Ss[non_canonical_s] = self.game.getGameEndedSelfPlay(board, True, self)
-                self.Es[s], self.Ss[non_canonical_s] = self.game.getGameEndedArena(board, True, None, None)
-        if self.Es[s] != 0:
-            return -self.Es[s]
-
-        # See if recursion limit has been reached
-        if calls > 500:
-            return 1e-4
-
-        # Get current game history if terminal state not found
-        if calls > 1:
-            canonicalHistory, x_boards, y_boards = self.game.getCanonicalHistory(copy.deepcopy(x_boards),
-                                                                                 copy.deepcopy(y_boards),
-                                                                                 canonicalBoard, player_board)
-
-        # If current state is a leaf node, add this to the tree
-        if s not in self.Ps:
-            # print("leaf node")
-            if self.is_self_play:
-                self.Ps[s], v = self.nnet.predict(canonicalHistory)  # changed from board.pieces
-            else:
-                self.Ps[s], v = self.predict(board)  # changed from board.pieces
-            valids = self.game.getValidMoves(board)
-            self.Ps[s] = self.Ps[s] * valids  # masking invalid moves
-            sum_Ps_s = np.sum(self.Ps[s])
-            if sum_Ps_s > 0:
-                self.Ps[s] /= sum_Ps_s  # renormalize
-            else:
-                # if all valid moves were masked make all valid moves equally probable
-
-                # NB! All valid moves may be masked if either your NNet architecture is insufficient or you've get overfitting or something else.
-                # If you have got dozens or hundreds of these messages you should pay attention to your NNet and/or training process.
-                self.Ps[s] = self.Ps[s] + valids
-                self.Ps[s] /= np.sum(self.Ps[s])
-
-            self.Vs[s] = valids
-            self.Ns[s] = 0
-
-            # do not use score threshold in MCTS
+        Returns:
+            (s, value): the key of the board reached and its value for the
+                        player to move, None if it is a leaf to expand
+        """
+        while True:
+            # See if game is in a terminal state
+            s = self.get_key(board)
             if s not in self.Es:
-                # self.Es[s], self.Ss[non_canonical_s] = self.game.getGameEndedSelfPlay(board, True, self)
-                self.Es[s], self.Ss[non_canonical_s] = self.game.getGameEndedArena(board, True, None, None)
-                gameEnd = self.Es[s]
-            else:
-                gameEnd = self.Es[s]
-            if gameEnd != 0:
-                return -gameEnd
-            return -v
-
-        # Current state is not a leaf node
-        valids = self.Vs[s]
-        cur_best = -float('inf')
-        best_act = -1
-        # pick the action with the highest upper confidence bound
+                # the score is only computed if the game has ended
+                self.Es[s] = self.game.getGameEndedArena(board)
+            if self.Es[s] != 0:
+                return s, self.Es[s]
+
+            # See if the depth limit has been reached
+            if len(path) >= 500:
+                return s, -1e-4
+
+            if s not in self.node_ids:
+                return s, None
+
+            node = self.nodes[self.node_ids[s]]
+            if path:
+                # link the edge that led here, for set_root
+                parent, parent_i = path[-1]
+                parent.children[parent_i] = self.node_ids[s]
+                if self.transpositions:
+                    value = self.catch_up(parent, parent_i, node, virtual_loss)
+                    if value is not None:
+                        return s, value
+            i = self.select(node, len(path) == 0)
+            if virtual_loss:
+                node.visits[i] += 1
+                node.value_sums[i] -= VIRTUAL_LOSS
+                node.visit_count += 1
+            path.append((node, i))
+            # descend on the same board, the moves are taken back by the caller. The action
+            # is one of the node's legal actions, computed for a position with the same legal
+            # moves (s covers the full move history, or all that legality depends on with
+            # transpositions), so it does not need to be revalidated
+            self.game.applyAction(board, int(node.actions[i]), trusted=True)
+
+    def catch_up(self, parent, i, node, virtual_loss=False):
+        """
+        With transpositions, the edge i of parent leads to node, which is shared with other
+        parents and may have been visited more often through them. When the edge has fewer
+        visits than the node and its Q value is more than TRANSPOSITION_EPSILON away from
+        the node's value, the simulation stops here and backs up the value that brings the
+        edge's Q value to the node's (clipped to [-1, 1]), as in Monte-Carlo Graph Search.
+        The pending visit and virtual loss of the edge (virtual_loss) are not counted.
+
+        Returns:
+            the value to back up for the player to move at node, None to keep descending
+        """
+        visits = float(parent.visits[i])
+        value_sum = float(parent.value_sums[i])
+        if virtual_loss:
+            visits -= 1
+            value_sum += VIRTUAL_LOSS
+        if visits >= 1 + node.visit_count:
+            return None
+        # the edge's target Q value, for the parent's player to move
+        target = -node.get_value()
+        if visits > 0 and abs(target - value_sum / visits) <= TRANSPOSITION_EPSILON:
+            return None
+        # (value_sum + v) / (visits + 1) = target
+        v = min(max(target * (visits + 1) - value_sum, -1.0), 1.0)
+        return -v
+
+    def select(self, node, is_root):
+        """
+        Index (into node.actions) of the edge with the highest upper confidence bound,
+        computed for all edges at once:
+            u = Q(s, a) + c_puct * P(s, a) * sqrt(N(s)) / (1 + N(s, a)), Q = 0 for unvisited edges
+        """
+        p = node.priors
         # add noise for root node prior probabilities (encourages exploration)
         if is_root and self.is_self_play:
-            noise = np.random.dirichlet([0.03] * len(self.game.filter_valid_moves(valids)))
-
-        i = -1
-        for a in range(self.game.getActionSize()):
-            if valids[a] != 0:
-                i += 1
-                if (s, a) in self.Qsa and self.Qsa[(s, a)] != None:
-                    q = self.Qsa[(s, a)]
-                    n_sa = self.Nsa[(s, a)]
-                    """u = self.Qsa[(s, a)] + self.config["c_puct"] * self.Ps[s][a] * math.sqrt(self.Ns[s]) / (
-                                1 + self.Nsa[(s, a)])"""
-                else:
-                    q = 0
-                    n_sa = 0
-                    # u = self.config["c_puct"] * self.Ps[s][a] * math.sqrt(self.Ns[s])  # Q = 0 ?
-
-                p = self.Ps[s][a]
-                # add noise for root node prior probabilities (encourages exploration)
-                if is_root and self.is_self_play:
-                    p = (1 - 0.25) * p + 0.25 * noise[i]
-                u = q + self.config["c_puct"] * p * math.sqrt(self.Ns[s]) / (1 + n_sa)
-                if u > cur_best:
-                    cur_best = u
-                    best_act = a
-
-        a = best_act
-        """if a == 49:
-            print("-------------Passed on call #", calls, "------------------")
-            print("Valids used to pass: ", valids)
-            print("Probs used to pass: ", self.Ps[s])"""
-        assert (valids[a] != 0)
-        # print("in MCTS.search, need next search, shifting player from 1")
+            noise = np.random.dirichlet([0.03] * len(node.actions))
+            p = (1 - 0.25) * p + 0.25 * noise
+        q = node.value_sums / np.maximum(node.visits, 1)
+        u = q + self.config["c_puct"] * math.sqrt(node.visit_count) * p / (1 + node.visits)
+        return int(np.argmax(u))
 
-        try:
-            next_s = self.game.getNextState(board, a)
-            # print("in MCTS.search, need next search, next player is {}".format(next_player))
-        except:
-            # print("###############在search内部节点出现错误：###########")
-            # print("action:{},valids:{},Vs:{}".format(a,valids,self.Vs[s]))
-            valids = self.game.getValidMoves(board)
-            self.Vs[s] = valids
-            cur_best = -float('inf')
-            best_act = -1
-
-            if is_root and self.is_self_play:
-                noise = np.random.dirichlet([0.03] * len(self.game.filter_valid_moves(valids)))
-
-            i = -1
-            for a in range(self.game.getActionSize()):
-                if valids[a] != 0:
-                    i += 1
-                    if (s, a) in self.Qsa and self.Qsa[(s, a)] != None:
-                        q = self.Qsa[(s, a)]
-                        n_sa = self.Nsa[(s, a)]
-                        """u = self.Qsa[(s, a)] + self.config["c_puct"] * self.Ps[s][a] * math.sqrt(self.Ns[s]) / (
-                                    1 + self.Nsa[(s, a)])"""
-                    else:
-                        q = 0
-                        n_sa = 0
-                        # u = self.config["c_puct"] * self.Ps[s][a] * math.sqrt(self.Ns[s])  # Q = 0 ?
-
-                    p = self.Ps[s][a]
-                    if is_root and self.is_self_play:
-                        p = (1 - 0.25) * p + 0.25 * noise[i]
-                    u = q + self.config["c_puct"] * p * math.sqrt(self.Ns[s]) / (1 + n_sa)
-                    if u > cur_best:
-                        cur_best = u
-                        best_act = a
-
-            a = best_act
-            # print("recalculate the valids vector:{} ".format(valids))
-            # try:
-            next_s = self.game.getNextState(board, a)
-            # except:
-            #     print(f"RETURNING Exception -- Tried Action {a}")
-            #     return
-
-        next_s_canonical = self.game.getCanonicalForm(next_s, next_s.current_player)
-
-        if 1 in player_board[0]:
-            player_board = (np.zeros((7, 7)), np.ones((7, 7)))
-        else:
-            player_board = (np.ones((7, 7)), np.zeros((7, 7)))
+    def search_batch(self, board, num_paths):
+        """
+        Run num_paths simulations from board together: descend num_paths paths with
+        virtual loss, evaluate the leaves they reach in one batched network call, then
+        back up all the values.
+
+        Each edge on a path gets a visit and a loss (-VIRTUAL_LOSS) while it is pending, so
+        that the following paths of the batch spread out instead of repeating it. Paths
+        that end in the same leaf share its evaluation.
+
+        Returns:
+            the number of simulations run (num_paths)
+        """
+        leaves = self.gather_leaves(board, num_paths)
+        if leaves:
+            pis, vs = self.nnet.predict_batch(self.get_leaf_inputs(leaves))
+            self.finish_leaves(leaves, pis, vs)
+        return num_paths
 
-        calls += 1
-        x_boards, y_boards = y_boards, x_boards
+    def gather_leaves(self, board, num_paths):
+        """
+        First half of search_batch: descend num_paths paths from board with virtual loss.
+        The paths ending in a terminal board (or at the depth limit) are backed up right
+        away, the others are returned by leaf, to be evaluated and passed to finish_leaves.
+        Nothing else may change the tree in between.
 
-        v = self.search(next_s, next_s_canonical, canonicalHistory, x_boards, y_boards, player_board, calls, False)
+        Returns:
+            {leaf s: (network input, legal actions, symmetry, paths ending there)}
+        """
+        leaves = {}  # leaf s -> (network input, legal actions, symmetry, paths ending there)
+        for _ in range(num_paths):
+            path = []
+            try:
+                s, value = self.descend(board, path, virtual_loss=True)
+                if value is None:
+                    if s not in leaves:
+                        leaves[s] = self.get_leaf_input(board) + ([],)
+                    leaves[s][3].append(path)
+            finally:
+                for _ in path:
+                    self.game.undoAction(board)
+            if value is not None:
+                self.backup(path, value)
+        return leaves
+
+    def get_leaf_inputs(self, leaves):
+        """
+        The network inputs of the leaves from gather_leaves, stacked in their order
+        """
+        return np.stack([leaf[0] for leaf in leaves.values()])
+
+    def finish_leaves(self, leaves, pis, vs):
+        """
+        Second half of search_batch: add the nodes of the leaves from gather_leaves, given
+        the network's policies and values for get_leaf_inputs(leaves), and back up the values
+        """
+        for (s, (_, actions, r, paths)), pi, v in zip(leaves.items(), pis, vs):
+            if r is not None:
+                # policy need to rotate and flip back
+                pi = pi[self.game.geometry.inverse_symmetries[r]]
+            v = float(np.reshape(v, -1)[0])
+            self.add_node(s, actions, pi, paths, v)
+            for path in paths:
+                self.backup(path, v)
+
+    def get_leaf_input(self, board):
+        """
+        (network input, legal actions, symmetry) of a leaf board, the input is a copy and,
+        outside of self play, turned by a random symmetry like predict does
+        """
+        actions = np.flatnonzero(self.game.getValidMoves(board))
+        if self.is_self_play:
+            return board.get_canonical_history(), actions, None
+        r = np.random.randint(8)
+        return board.rotate_history(r, board.get_canonical_history()), actions, r
 
-        if (s, a) in self.Qsa:
-            assert (valids[a] != 0)
-            self.Qsa[(s, a)] = (self.Nsa[(s, a)] * self.Qsa[(s, a)] + v) / (self.Nsa[(s, a)] + 1)
-            self.Nsa[(s, a)] += 1
+    def backup(self, path, value):
+        """
+        Back up the value of a path's leaf (for the player to move there) along the
+        path, taking back the virtual loss of each edge
+        """
+        v = -value
+        for node, i in reversed(path):
+            node.value_sums[i] += v + VIRTUAL_LOSS
+            v = -v
+
+    def expand(self, board, s, path):
+        """
+        Evaluate the leaf board s, reached by path, with the network and add its node
+        to the tree.
+
+        Returns:
+            v: the network's value of the board for the player to move
+        """
+        if self.is_self_play:
+            # board.get_features() is kept up to date by play/undo, no history to rebuild here
+            pi, v = self.nnet.predict(board.get_features())  # changed from board.pieces
+        else:
+            pi, v = self.predict(board)  # changed from board.pieces
+        v = float(np.reshape(v, -1)[0])
+        self.add_node(s, np.flatnonzero(self.game.getValidMoves(board)), pi, [path], v)
+        return v
+
+    def add_node(self, s, actions, pi, paths, value=0.0):
+        """
+        Add the node of board s to the tree, with the policy pi masked to its legal
+        actions as priors and the network value `value`, and link it to the last edge
+        of each of the paths reaching it
+        """
+        priors = np.asarray(pi, dtype=np.float32)[actions]  # masking invalid moves
+        sum_priors = np.sum(priors)
+        if sum_priors > 0:
+            priors /= sum_priors  # renormalize
         else:
-            self.Qsa[(s, a)] = v
-            self.Nsa[(s, a)] = 1
+            # if all valid moves were masked make all valid moves equally probable
 
-        self.Ns[s] += 1
+            # NB! All valid moves may be masked if either your NNet architecture is insufficient or you've get overfitting or something else.
+            # If you have got dozens or hundreds of these messages you should pay attention to your NNet and/or training process.
+            priors = np.full(len(actions), 1 / len(actions), dtype=np.float32)
 
-        return -v
+        node_id = len(self.nodes)
+        self.node_ids[s] = node_id
+        self.nodes.append(Node(s, actions, priors, value))
+        for path in paths:
+            if path:
+                parent, parent_i = path[-1]
+                parent.children[parent_i] = node_id
+
+    def set_root(self, s):
+        """
+        Make board s the root of the tree. Its subtree is kept and every node that
+        cannot be reached from it any more is freed, then, beyond max_nodes, the least
+        visited subtrees are evicted: nodes are kept best first by the visits of the
+        edge leading to them, so a node is only kept along with its parent (with
+        transpositions, a node reached by several parents along with the first one kept).
+        The kept nodes get new ids, the root id 0.
+        """
+        if s not in self.node_ids:
+            self.clear()
+            return
+        root_id = self.node_ids[s]
+        if root_id == self.root_id and len(self.nodes) <= self.max_nodes:
+            return
+
+        kept = []
+        kept_ids = set()
+        heap = [(0.0, root_id)]
+        while heap and len(kept) < self.max_nodes:
+            _, node_id = heapq.heappop(heap)
+            if node_id in kept_ids:
+                # with transpositions a node is pushed once per parent
+                continue
+            kept.append(node_id)
+            kept_ids.add(node_id)
+            node = self.nodes[node_id]
+            for i in np.flatnonzero(node.children >= 0):
+                heapq.heappush(heap, (-float(node.visits[i]), int(node.children[i])))
+
+        new_ids = np.full(len(self.nodes), -1, dtype=np.int32)
+        new_ids[kept] = np.arange(len(kept), dtype=np.int32)
+        self.nodes = [self.nodes[node_id] for node_id in kept]
+        self.node_ids = {}
+        for node_id, node in enumerate(self.nodes):
+            # edges to evicted nodes become unexpanded again, their statistics stay
+            node.children = np.where(node.children >= 0, new_ids[node.children], -1).astype(np.int32)
+            self.node_ids[node.key] = node_id
+        self.Es = {key: value for key, value in self.Es.items() if key in self.node_ids}
+        self.root_id = 0
     
     def predict(self, board):
         # randomly rotate and flip before network predict
@@ -333,26 +477,12 @@ class MCTS:
         pi, v = self.nnet.predict(nnet_input)
 
         # policy need to rotate and flip back
-        pi_board = np.reshape(pi[:-1], (self.game.n, self.game.n))
-        if r >= 4:
-            pi_board = np.fliplr(pi_board)
-        pi_board = np.rot90(pi_board, 4 - r % 4)
-        p = list(pi_board.ravel()) + [pi[-1]]
+        p = pi[self.game.geometry.inverse_symmetries[r]]
 
         return p, v
-    
-
-    def checkScoreCache(self, board):
-        non_canonical_s = self.game.stringRepresentation(board, is_canonical=False)
-        if non_canonical_s not in self.Ss:
-            return False, None
-        else:
-            return True, self.Ss[non_canonical_s]
 
     def clear(self):
-        self.Qsa = {}  # stores Q values for s,a (as defined in the paper)
-        self.Nsa = {}  # stores #times edge s,a was visited
-        self.Ns = {}  # stores #times board s was visited
-        self.Ps = {}  # stores initial policy (returned by neural net)
+        self.node_ids = {}  # stores the node id of each expanded board s
+        self.nodes = []  # stores the expanded nodes (see Node), indexed by node id
         self.Es = {}  # stores game.getGameEnded ended for board s
-        self.Vs = {}  # stores game.getValidMoves for board s
\ No newline at end of file
+        self.root_id = None  # node id of the last search root
\ No newline at end of file
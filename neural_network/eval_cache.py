@@ -0,0 +1,54 @@
+import itertools
+from hashlib import blake2b
+
+import numpy as np
+
+from utils.lru_cache import LRUCache
+
+'''
+Evaluation cache.
+Bounded least recently used cache of network evaluations (see utils/lru_cache.py),
+shared by every NNetWrapper in the process (see get_eval_cache) so that positions
+repeated across self play and arena games are only evaluated once per model.
+Keys are (model version, digest of the network input planes) where the planes
+are first brought to a canonical orientation: of the 8 board symmetries, the
+one with the smallest digest. Policies are stored in that orientation and
+turned back for the orientation asked for on a hit, see get_canonical_key.
+Values are (canonical policy, value, canonical ownership), the ownership is None
+for networks without an ownership head.
+Every set of weights gets a new model version (see next_model_version), so
+loading a checkpoint or training invalidates the entries of the old weights,
+which then age out of the cache.
+'''
+EVAL_CACHE_SIZE = 100000
+
+_MODEL_VERSIONS = itertools.count()
+
+
+def next_model_version():
+    """A model version no network of this process has had yet
+    """
+    return next(_MODEL_VERSIONS)
+
+
+def get_canonical_key(planes, symmetries):
+    """(digest, r) of a (planes, n, n) network input: r is the symmetry (see
+    Geometry.symmetries) that gives the smallest digest, digest the one of the
+    planes turned by r. A policy p of the input is p[symmetries[r]] in the
+    canonical orientation and a canonical policy c is c[inverse_symmetries[r]]
+    for the input
+    """
+    flat = np.ascontiguousarray(planes, dtype=np.float32).reshape(len(planes), -1)
+    turned = flat[:, symmetries[:, :-1]]
+    digests = [blake2b(turned[:, r].tobytes(), digest_size=8).digest() for r in range(len(symmetries))]
+    r = min(range(len(digests)), key=digests.__getitem__)
+    return digests[r], r
+
+
+_EVAL_CACHE = LRUCache(EVAL_CACHE_SIZE)
+
+
+def get_eval_cache():
+    """The evaluation cache shared by the whole process
+    """
+    return _EVAL_CACHE
@@ -94,16 +94,17 @@ class AlphaBlock(nn.Module):
 
 
 class AlphaNet(ResNet):
-    def __init__(self, game, layers):
+    def __init__(self, game, layers, ownership_head=False):
         block = AlphaBlock
         self.board_x, self.board_y = game.getBoardSize()
         self.action_size = game.getActionSize()
+        self.num_planes = game.getFeaturePlanes()
         outputShift = 1 if self.board_x in [6, 7, 11] else 4
         self.inplanes = 128  # changed from 64
 
         super(ResNet, self).__init__()
 
-        self.conv1 = nn.Conv2d(19, 128, kernel_size=5, stride=1, padding=2,
+        self.conv1 = nn.Conv2d(self.num_planes, 128, kernel_size=5, stride=1, padding=2,
                                bias=False)
         self.bn1 = nn.BatchNorm2d(128)
         self.relu = nn.ReLU(inplace=True)
@@ -117,6 +118,10 @@ class AlphaNet(ResNet):
         self.fc_p = nn.Linear(3200 * block.expansion * outputShift,
                               self.action_size)  # changed from 512*block.expansion*outputShift, self.action_size
         self.fc_v = nn.Linear(3200 * block.expansion * outputShift, 1)
+        # optional ownership output: one plane over the board, read from the last layer before pooling
+        self.ownership_head = ownership_head
+        if ownership_head:
+            self.conv_o = nn.Conv2d(128 * block.expansion, 1, kernel_size=1, bias=True)
 
         for m in self.modules():
             if isinstance(m, nn.Conv2d):
@@ -145,7 +150,7 @@ class AlphaNet(ResNet):
 
     def forward(self, x):
         # print("forward")
-        x = x.view(-1, 19, self.board_x, self.board_y)
+        x = x.view(-1, self.num_planes, self.board_x, self.board_y)
         # print("Before conv1:", x.size())
         x = self.conv1(x)
         # print("After conv1:", x.size())
@@ -160,6 +165,8 @@ class AlphaNet(ResNet):
         # print("After layer3:", x.size())
         x = self.layer4(x)
         # print("After layer4:", x.size())
+        if self.ownership_head:
+            o = F.tanh(self.conv_o(x)).view(-1, self.board_x, self.board_y)
 
         try:
             x = self.avgpool(x)
@@ -173,13 +180,16 @@ class AlphaNet(ResNet):
         v = self.fc_v(x)
         # print("After p:", p.size())
         # print("After v:", v.size())
+        if self.ownership_head:
+            return F.log_softmax(p, dim=1), F.tanh(v), o
         return F.log_softmax(p, dim=1), F.tanh(v)
 
 
 class AlphaNetMaker:
-    def __init__(self, game):
+    def __init__(self, game, ownership_head=False):
         self.n, self.n = game.getBoardSize()
         self.game = game
+        self.ownership_head = ownership_head
 
     def makeNet(self):
         if self.n <= 11:
@@ -195,7 +205,7 @@ class AlphaNetMaker:
         Args:
             pretrained (bool): If True, returns a model pre-trained on ImageNet
         """
-        model = AlphaNet(game, [2, 2, 2, 2])
+        model = AlphaNet(game, [2, 2, 2, 2], self.ownership_head)
         if pretrained:
             model.load_state_dict(model_zoo.load_url(model_urls['resnet18']))
         return model
@@ -206,7 +216,7 @@ class AlphaNetMaker:
         Args:
             pretrained (bool): If True, returns a model pre-trained on ImageNet
         """
-        model = AlphaNet(game, [3, 4, 6, 3])
+        model = AlphaNet(game, [3, 4, 6, 3], self.ownership_head)
         if pretrained:
             model.load_state_dict(model_zoo.load_url(model_urls['resnet34']))
         return model
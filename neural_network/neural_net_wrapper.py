@@ -11,6 +11,7 @@ from torch.autograd import Variable
 
 from neural_network.neural_net import NeuralNet
 from .training_utils import Bar, AverageMeter
+from .eval_cache import get_eval_cache, get_canonical_key, next_model_version
 from .go_alphanet import AlphaNetMaker as NetMaker
 from .go_neural_net import GoNNet
 import matplotlib.pyplot as plt
@@ -25,16 +26,21 @@ class NNetWrapper(NeuralNet):
         self.config = config
 
         self.netType = self.config["network_type"]
+        # predict the final ownership of every point as a third output (RES only)
+        self.use_ownership_head = self.config["use_ownership_head"]
         if self.netType == 'RES':
-            netMkr = NetMaker(game)
+            netMkr = NetMaker(game, ownership_head=self.use_ownership_head)
             self.nnet = netMkr.makeNet()
         elif self.netType == 'CNN':
+            if self.use_ownership_head:
+                raise ValueError("The ownership head is only available with network type 'RES'")
             self.nnet = GoNNet(game, self.config)
         else:
             raise ValueError(f"Unknown network type: {self.netType}. Valid options are 'RES' or 'CNN'")
 
         self.board_x, self.board_y = game.getBoardSize()
         self.action_size = game.getActionSize()
+        self.num_planes = game.getFeaturePlanes()
 
         if torch.backends.mps.is_available():
             device = torch.device('mps')
@@ -47,9 +53,22 @@ class NNetWrapper(NeuralNet):
 
         self.lrs = []
 
+        # evaluations shared by every network of the process (see neural_network/eval_cache.py),
+        # keyed by the version of the weights, which changes on every load and training run
+        self.model_version = next_model_version()
+        self.symmetries = game.geometry.symmetries
+        self.inverse_symmetries = game.geometry.inverse_symmetries
+        if self.config["eval_cache_size"] > 0:
+            self.eval_cache = get_eval_cache()
+            self.eval_cache.max_size = self.config["eval_cache_size"]
+        else:
+            self.eval_cache = None
+
     def train(self, examples):
         """
-        examples: list of examples, each example is of form (board, pi, v)
+        examples: list of examples, each example is of form (board, pi, v) or, from self play
+                  with the ownership head, (board, pi, v, ownership). The ownership loss only
+                  counts the examples that have an ownership target
         """
 
         if self.config["optimizer_type"] == "Adam":
@@ -67,7 +86,8 @@ class NNetWrapper(NeuralNet):
         trainLog = {
             'EPOCH': [],
             'P_LOSS': [],
-            'V_LOSS': []
+            'V_LOSS': [],
+            'O_LOSS': []
         }
 
         for epoch in range(self.config["epochs"]):
@@ -78,6 +98,7 @@ class NNetWrapper(NeuralNet):
             batch_time = AverageMeter()
             pi_losses = AverageMeter()
             v_losses = AverageMeter()
+            o_losses = AverageMeter()
             end = time.time()
 
             bar = Bar('Training Network', max_value=int(len(examples) / self.config["batch_size"]))
@@ -85,7 +106,8 @@ class NNetWrapper(NeuralNet):
 
             while batch_idx < int(len(examples) / self.config["batch_size"]):
                 sample_ids = np.random.randint(len(examples), size=self.config["batch_size"])
-                boards, pis, vs = list(zip(*[examples[i] for i in sample_ids]))
+                batch = [examples[i] for i in sample_ids]
+                boards, pis, vs = list(zip(*[example[:3] for example in batch]))
                 # Convert board histories to stacks as defined in paper
                 temp_boards = list(boards)
                 for i in range(len(temp_boards)):
@@ -113,12 +135,27 @@ class NNetWrapper(NeuralNet):
                 # measure data loading time
                 data_time.update(time.time() - end)
                 # compute output
-                out_pi, out_v = self.nnet(boards)
+                outputs = self.nnet(boards)
+                out_pi, out_v = outputs[0], outputs[1]
 
                 l_pi = self.loss_pi(target_pis, out_pi)
                 l_v = self.loss_v(target_vs, out_v)
                 total_loss = l_pi + l_v
 
+                if self.use_ownership_head:
+                    # examples without an ownership target (older 3-tuples) are masked out
+                    target_os = np.zeros((len(batch), self.board_x, self.board_y), dtype=np.float32)
+                    has_os = np.zeros(len(batch), dtype=np.float32)
+                    for i, example in enumerate(batch):
+                        if len(example) > 3:
+                            target_os[i] = example[3]
+                            has_os[i] = 1
+                    target_os = torch.from_numpy(target_os).to(device)
+                    has_os = torch.from_numpy(has_os).to(device)
+                    l_o = self.loss_o(target_os, outputs[2], has_os)
+                    total_loss = total_loss + l_o
+                    o_losses.update(l_o.data.item(), boards.size(0))
+
                 # record loss
                 pi_losses.update(l_pi.data.item(), boards.size(0))
                 v_losses.update(l_v.data.item(), boards.size(0))
@@ -167,6 +204,7 @@ class NNetWrapper(NeuralNet):
             # plot avg pi loss and v loss for all epochs in iteration
             trainLog['P_LOSS'].append(pi_losses.avg)
             trainLog['V_LOSS'].append(v_losses.avg)
+            trainLog['O_LOSS'].append(o_losses.avg)
             bar.finish()
 
         """
@@ -181,16 +219,55 @@ class NNetWrapper(NeuralNet):
             plt.close()
         """
 
+        # the weights changed, cached evaluations of the old ones no longer apply
+        self.model_version = next_model_version()
+
         return pd.DataFrame(data=trainLog)
 
-    def predict(self, board_list):
+    def predict(self, board_list, with_ownership=False):
+        """
+        board: (planes, n, n) float32 array from Board.get_features() (or a list of planes)
+        with_ownership: also return the (n, n) ownership predicted by the ownership head,
+                        from the point of view of the player to move
+        Evaluations are looked up in the evaluation cache first, a position matches any of
+        its 8 symmetries. With the ownership head the cache also keeps the ownership, so
+        asking for the ownership of a position the search evaluated costs no forward pass
+        """
+        self.check_ownership_head(with_ownership)
+        if self.eval_cache is None:
+            return self.evaluate(board_list, with_ownership)
+
+        canonical_key, r = get_canonical_key(board_list, self.symmetries)
+        key = (self.model_version, canonical_key)
+        cached = self.eval_cache.get(key)
+        if cached is None:
+            outputs = self.evaluate(board_list, self.use_ownership_head)
+            cached = (outputs[0][self.symmetries[r]], outputs[1].copy(),
+                      self.turn_ownership(outputs[2], self.symmetries[r]) if self.use_ownership_head else None)
+            self.eval_cache.put(key, cached)
+        pi, v, ownership = cached
+        if with_ownership:
+            return pi[self.inverse_symmetries[r]], v.copy(), self.turn_ownership(ownership, self.inverse_symmetries[r])
+        return pi[self.inverse_symmetries[r]], v.copy()
+
+    def turn_ownership(self, ownership, permutation):
+        # (n, n) ownership permuted like a policy by one of the symmetry tables, without the pass entry
+        return np.asarray(ownership).reshape(-1)[permutation[:-1]].reshape(self.board_x, self.board_y)
+
+    def check_ownership_head(self, with_ownership):
+        if with_ownership and not self.use_ownership_head:
+            raise ValueError("The ownership was asked for but the network has no ownership head, "
+                             "set use_ownership_head and load a checkpoint trained with it")
+
+    def evaluate(self, board_list, with_ownership=False):
         """
-        board: np array with board
+        predict without the evaluation cache
         """
-        # preparing input
-        board = np.stack(board_list)
+        self.check_ownership_head(with_ownership)
+        # preparing input, a float32 array is wrapped without copying
+        board = np.ascontiguousarray(board_list, dtype=np.float32)
         # print("stack length: ", len(board))
-        board = torch.FloatTensor(board.astype(np.float64))
+        board = torch.from_numpy(board)
         # print("stack length2: ", len(board))
         # if torch.cuda.is_available(): board = board.contiguous().cuda()
         if torch.backends.mps.is_available():
@@ -204,14 +281,73 @@ class NNetWrapper(NeuralNet):
 
         board = Variable(board, requires_grad=False)
         # print("stack length3: ", len(board))
-        board = board.view(19, self.board_x, self.board_y)
+        board = board.view(self.num_planes, self.board_x, self.board_y)
         # print("stack length4: ", len(board))
 
         self.nnet.eval()
 
-        pi, v = self.nnet(board)
+        outputs = self.nnet(board)
+        pi, v = outputs[0], outputs[1]
+        if with_ownership:
+            return torch.exp(pi).data.cpu().numpy()[0], v.data.cpu().numpy()[0], outputs[2].data.cpu().numpy()[0]
         return torch.exp(pi).data.cpu().numpy()[0], v.data.cpu().numpy()[0]
 
+    def predict_batch(self, boards):
+        """
+        boards: (batch, planes, n, n) float32 array of network inputs
+        Returns (pis, vs): the (batch, action_size) policies and the (batch,) values
+        Only the boards missing from the evaluation cache go through the network, with the
+        ownership head their ownership is cached too (see predict)
+        """
+        if self.eval_cache is None:
+            return self.evaluate_batch(boards)
+
+        pis = np.zeros((len(boards), self.action_size), dtype=np.float32)
+        vs = np.zeros(len(boards), dtype=np.float32)
+        misses = []
+        for i, board in enumerate(boards):
+            canonical_key, r = get_canonical_key(board, self.symmetries)
+            key = (self.model_version, canonical_key)
+            cached = self.eval_cache.get(key)
+            if cached is not None:
+                pis[i] = cached[0][self.inverse_symmetries[r]]
+                vs[i] = cached[1][0]
+            else:
+                misses.append((i, key, r))
+        if misses:
+            outputs = self.evaluate_batch(np.stack([boards[i] for (i, _, _) in misses]), self.use_ownership_head)
+            for k, (i, key, r) in enumerate(misses):
+                pis[i] = outputs[0][k]
+                vs[i] = outputs[1][k]
+                ownership = self.turn_ownership(outputs[2][k], self.symmetries[r]) if self.use_ownership_head else None
+                self.eval_cache.put(key, (outputs[0][k][self.symmetries[r]], np.array([outputs[1][k]], dtype=np.float32),
+                                          ownership))
+        return pis, vs
+
+    def evaluate_batch(self, boards, with_ownership=False):
+        """
+        predict_batch without the evaluation cache, with_ownership also returns the
+        (batch, n, n) ownership predictions
+        """
+        self.check_ownership_head(with_ownership)
+        boards = torch.from_numpy(np.ascontiguousarray(boards, dtype=np.float32))
+        if torch.backends.mps.is_available():
+            device = torch.device('mps')
+        elif torch.cuda.is_available():
+            device = torch.device('cuda')
+        else:
+            device = torch.device('cpu')
+
+        boards = boards.contiguous().to(device)
+        self.nnet.eval()
+
+        with torch.no_grad():
+            outputs = self.nnet(boards)
+        pis, vs = outputs[0], outputs[1]
+        if with_ownership:
+            return torch.exp(pis).cpu().numpy(), vs.view(-1).cpu().numpy(), outputs[2].cpu().numpy()
+        return torch.exp(pis).cpu().numpy(), vs.view(-1).cpu().numpy()
+
     def loss_pi(self, targets, outputs):
         #return -torch.sum(targets * outputs) / targets.size()[0]
         loss = torch.nn.CrossEntropyLoss()
@@ -220,6 +356,11 @@ class NNetWrapper(NeuralNet):
     def loss_v(self, targets, outputs):
         return torch.sum((targets - outputs.view(-1)) ** 2) / targets.size()[0]
 
+    def loss_o(self, targets, outputs, mask):
+        # mean squared error per point, over the examples that have an ownership target
+        per_example = torch.sum(((targets - outputs) ** 2).view(targets.size(0), -1), dim=1) / (self.board_x * self.board_y)
+        return torch.sum(per_example * mask) / torch.clamp(torch.sum(mask), min=1)
+
     def save_checkpoint(self, folder='R_checkpoint', filename='R_checkpoint.pth.tar'):
         filepath = os.path.join(folder, filename)
         if not os.path.exists(folder):
@@ -231,6 +372,12 @@ class NNetWrapper(NeuralNet):
             'state_dict': self.nnet.state_dict(),
         }, filepath)
 
+    def check_checkpoint(self, state_dict, filepath):
+        # a network built with the ownership head cannot run weights trained without it
+        if self.use_ownership_head and not any(name.split('.')[-2:-1] == ['conv_o'] for name in state_dict):
+            raise ValueError(f"The checkpoint {filepath} has no ownership head (conv_o), "
+                             "turn use_ownership_head off or train a network with it")
+
     # use cpu_only for maximum compatibility with slowest performance
     def load_checkpoint(self, folder='R_checkpoint', filename='R_checkpoint.pth.tar', cpu_only=False):
         # https://github.com/pytorch/examples/blob/master/imagenet/main.py#L98
@@ -249,7 +396,9 @@ class NNetWrapper(NeuralNet):
 
         checkpoint = torch.load(filepath, map_location=device, weights_only=True)
 
+        self.check_checkpoint(checkpoint['state_dict'], filepath)
         self.nnet.load_state_dict(checkpoint['state_dict'])
+        self.model_version = next_model_version()
 
     # use cpu_only for maximum compatibility with slowest performance
     def load_checkpoint_from_plain_to_parallel(self, folder='R_checkpoint', filename='R_checkpoint.pth.tar',
@@ -270,12 +419,14 @@ class NNetWrapper(NeuralNet):
         checkpoint = torch.load(filepath, map_location=device, weights_only=True)
 
         state_dict = checkpoint['state_dict']
+        self.check_checkpoint(state_dict, filepath)
 
         new_state_dict = OrderedDict()
         for k, v in state_dict.items():
             name = "module." + k  # add 'module.' of dataparallel, so it works with examples from plain model
             new_state_dict[name] = v
         self.nnet.load_state_dict(new_state_dict)
+        self.model_version = next_model_version()
 
     def load_checkpoint_without_sens_layer(self, folder='R_checkpoint', filename='R_checkpoint.pth.tar',
                                                cpu_only=True):
@@ -294,4 +445,6 @@ class NNetWrapper(NeuralNet):
 
         checkpoint = torch.load(filepath, map_location=device, weights_only=True)
 
-        self.nnet.load_state_dict(checkpoint['state_dict'])
\ No newline at end of file
+        self.check_checkpoint(checkpoint['state_dict'], filepath)
+        self.nnet.load_state_dict(checkpoint['state_dict'])
+        self.model_version = next_model_version()
\ No newline at end of file
@@ -45,7 +45,7 @@ class Arena:
         action_history = []
         x_boards = []
         y_boards = []
-        c_boards = [np.ones((7, 7)), np.zeros((7, 7))]
+        c_boards = [np.ones((self.config["board_size"], self.config["board_size"])), np.zeros((self.config["board_size"], self.config["board_size"]))]
         for i in range(8):
             x_boards.append(np.zeros((self.config["board_size"], self.config["board_size"])))
             y_boards.append(np.zeros((self.config["board_size"], self.config["board_size"])))
@@ -0,0 +1,85 @@
+import numpy as np
+
+from definitions import CONFIG_PATH
+from mcts import MCTS
+from training.self_play_manager import SelfPlayManager
+from utils.config_handler import ConfigHandler
+
+
+class InterleavedSelfPlayManager:
+    """
+    Plays many self play games at once in a single process, with one copy of the network.
+    Every game has its own SelfPlayManager and MCTS tree. Each round, the search of every
+    game descends to the leaves it needs evaluated (MCTS.gather_leaves), the leaves of all
+    games go through the network in one batched forward, and each search backs up its
+    results (MCTS.finish_leaves). A game plays its move once its search has run
+    num_full_search_sims simulations, and a new game takes its place when it ends.
+    """
+
+    def __init__(self, go_game, neural_net):
+        self.config = ConfigHandler(CONFIG_PATH)
+        self.neural_net = neural_net
+        self.managers = [SelfPlayManager(go_game, neural_net, MCTS(game=go_game, nnet=neural_net, is_self_play=True))
+                         for _ in range(self.config["num_interleaved_games"])]
+
+    def execute_games(self, num_games):
+        """
+        Play num_games self play games, num_interleaved_games at a time, and return the
+        training examples of all of them
+        """
+        num_sims = self.config["num_full_search_sims"]
+        # simulations each game runs per round, with virtual loss if more than one
+        paths_per_round = max(1, self.config["mcts_batch_size"])
+        train_examples = []
+        # manager -> [canonical board, temperature, node key (see MCTS.get_key), simulations done] of its current move
+        searches = {}
+        games_started = 0
+
+        for manager in self.managers[:num_games]:
+            manager.start_game()
+            games_started += 1
+            self.start_turn(manager, searches)
+
+        while searches:
+            pending = []
+            for manager, search in searches.items():
+                num_paths = min(paths_per_round, num_sims - search[3])
+                leaves = manager.mcts.gather_leaves(manager.board, num_paths)
+                search[3] += num_paths
+                if leaves:
+                    pending.append((manager, leaves))
+
+            # one forward pass for the leaves of every game
+            if pending:
+                inputs = [manager.mcts.get_leaf_inputs(leaves) for manager, leaves in pending]
+                pis, vs = self.neural_net.predict_batch(np.concatenate(inputs))
+                start = 0
+                for (manager, leaves), batch in zip(pending, inputs):
+                    end = start + len(batch)
+                    manager.mcts.finish_leaves(leaves, pis[start:end], vs[start:end])
+                    start = end
+
+            for manager, (canonicalBoard, temp, s, sims_done) in list(searches.items()):
+                if sims_done < num_sims:
+                    continue
+                pi = manager.mcts.get_probs(manager.board, s, temp)
+                result = manager.play_move(pi, temp)
+                if result == 0:
+                    self.start_turn(manager, searches)
+                    continue
+                train_examples += manager.finish_game(result)
+                print("Self play game completed.")
+                del searches[manager]
+                if games_started < num_games:
+                    manager.start_game()
+                    games_started += 1
+                    self.start_turn(manager, searches)
+
+        return train_examples
+
+    def start_turn(self, manager, searches):
+        # start the search of the manager's next move, rooted at its current board
+        canonicalBoard, temp = manager.next_turn()
+        s = manager.mcts.get_key(canonicalBoard)
+        manager.mcts.set_root(s)
+        searches[manager] = [canonicalBoard, temp, s, 0]
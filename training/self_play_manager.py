@@ -3,66 +3,90 @@ import random
 import numpy as np
 
 from definitions import CONFIG_PATH
-from go.go_game import GoGame
 from logger.gtp_logger import GTPLogger, GameType
 from utils.config_handler import ConfigHandler
 
 
 class SelfPlayManager:
 
-    def __init__(self, neural_net, mcts):
+    def __init__(self, go_game, neural_net, mcts):
         self.config = ConfigHandler(CONFIG_PATH)
-        self.go_game = GoGame(self.config['board_size'])
+        # the game the boards are played with, the same one mcts searches with
+        self.go_game = go_game
         self.neural_net = neural_net
         self.mcts = mcts
         self.gtp_logger = GTPLogger()
+        # score self play games with the network's ownership predictions instead of dead stone simulations
+        self.use_ownership_head = self.config['use_ownership_head']
 
     def execute_game(self):
-        game_train_examples = []
-        board = self.go_game.getInitBoard()
-        turn_count = 0
+        self.start_game()
         result = 0
-        # For new MCTS
-        c_boards = [np.ones((7, 7)), np.zeros((7, 7))]
-        x_boards, y_boards = self.go_game.init_x_y_boards()
 
         while result == 0:
-            turn_count += 1
-            temp = int(turn_count < self.config["temperature_threshold"])
-            # Code for old MCTS
-            x_boards, y_boards = y_boards, x_boards
-
-            # Code for old MCTS
-            canonicalBoard = self.go_game.getCanonicalForm(board, board.current_player)
-            player_board = (c_boards[0], c_boards[1]) if board.current_player == 1 else (c_boards[1], c_boards[0])
-            canonicalHistory, x_boards, y_boards = self.go_game.getCanonicalHistory(x_boards, y_boards, canonicalBoard, player_board)
+            canonicalBoard, temp = self.next_turn()
 
             num_sims = self.config["num_full_search_sims"]
-            is_full_search = True
 
-            pi = self.mcts.getActionProb(board, canonicalBoard, canonicalHistory, x_boards, y_boards, player_board, num_sims, temp=temp)
+            pi = self.mcts.getActionProb(self.board, canonicalBoard, num_sims, temp=temp)
+
+            result = self.play_move(pi, temp)
 
-            # choose a move
-            if temp == 1:
-                action = np.random.choice(len(pi), p=pi)
-            else:
-                action = np.argmax(pi)
+        return self.finish_game(result)
 
-            self.gtp_logger.add_action(action, board)
+    def start_game(self):
+        self.game_train_examples = []
+        self.board = self.go_game.getInitBoard()
+        self.turn_count = 0
 
-            masked_pi = [0 for _ in range(self.go_game.getActionSize())]
-            masked_pi[action] = 1
+    def next_turn(self):
+        """
+        Start the next turn of the game, returns the canonical board to search and the temperature
+        """
+        self.turn_count += 1
+        temp = int(self.turn_count < self.config["temperature_threshold"])
+        return self.go_game.getCanonicalForm(self.board, self.board.current_player), temp
 
-            # get different symmetries/rotations of the board if full search was done
-            if is_full_search:
-                canonical_history = board.get_canonical_history()
-                sym = self.go_game.getSymmetries(canonical_history, masked_pi)
-                for b, p in sym:
-                    game_train_examples.append([b, board.current_player, p, None])
+    def play_move(self, pi, temp):
+        """
+        Choose a move from the search probabilities pi, record its training examples and play it.
+        Returns the game result (0 while the game goes on)
+        """
+        board = self.board
+        is_full_search = True
 
-            # play the chosen move
-            board = self.go_game.getNextState(board, action)
-            result, score = self.go_game.getGameEndedSelfPlay(board.copy(), return_score=True, mcts=self.mcts)
+        # choose a move
+        if temp == 1:
+            action = np.random.choice(len(pi), p=pi)
+        else:
+            action = np.argmax(pi)
+
+        self.gtp_logger.add_action(action, board)
+
+        masked_pi = [0 for _ in range(self.go_game.getActionSize())]
+        masked_pi[action] = 1
+
+        # get different symmetries/rotations of the board if full search was done
+        if is_full_search:
+            canonical_history = board.get_canonical_history()
+            sym = self.go_game.getSymmetries(canonical_history, masked_pi)
+            for k, (b, p) in enumerate(sym):
+                self.game_train_examples.append([b, board.current_player, p, k])
+
+        # play the chosen move
+        board = self.board = self.go_game.getNextState(board, action)
+        # the predicted ownership only decides whether the score threshold ends the game early
+        predicted_ownership = None
+        if self.use_ownership_head and len(board.history) > 10:
+            predicted_ownership = self.predict_ownership(board)
+        return self.go_game.getGameEndedSelfPlay(board, predicted_ownership=predicted_ownership)
+
+    def finish_game(self, result):
+        """
+        Training examples of the finished game
+        """
+        board = self.board
+        game_train_examples = self.game_train_examples
 
         # save 10% of self play games
         if random.random() <= 0.10:
@@ -71,4 +95,20 @@ class SelfPlayManager:
             self.gtp_logger.reset()
         
         # return game result
-        return [(x[0], x[2], result * ((-1) ** (x[1] != board.current_player))) for x in game_train_examples]
+        if not self.use_ownership_head:
+            return [(x[0], x[2], result * ((-1) ** (x[1] != board.current_player))) for x in game_train_examples]
+
+        # with the ownership head the examples also hold the final ownership, counted exactly (not
+        # from the network's own prediction), from the point of view of the player to move and
+        # turned by the example's symmetry (x[3])
+        _, final_ownership = self.go_game.getScoreAndOwnership(board)
+        ownership_syms = self.go_game.getOwnershipSymmetries(final_ownership).astype(np.float32)
+        return [(x[0], x[2], result * ((-1) ** (x[1] != board.current_player)), ownership_syms[x[3]] * x[1])
+                for x in game_train_examples]
+
+    def predict_ownership(self, board):
+        # ownership of the position predicted by the network, in black (1) / white (-1) colors.
+        # The search already evaluated the position as a leaf, so with the evaluation cache on the
+        # ownership comes from that evaluation (see NNetWrapper.predict)
+        _, _, ownership = self.neural_net.predict(board.get_features(), with_ownership=True)
+        return ownership * board.current_player
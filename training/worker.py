@@ -13,6 +13,7 @@ from go.go_game import GoGame
 from mcts import MCTS as MCTS
 from neural_network.neural_net_wrapper import NNetWrapper
 from training.arena_manager import ArenaManager
+from training.interleaved_self_play_manager import InterleavedSelfPlayManager
 from training.self_play_manager import SelfPlayManager
 from utils.config_handler import ConfigHandler
 from utils.data_serializer import save_obj_to_disk, save_json_to_disk
@@ -65,7 +66,8 @@ class Worker:
 
         # self.handle_self_play_lifecycle()
 
-    # TODO: when do we want to reset the MCTS tree? Currently per thread batch, not per game for self_play
+    # The MCTS tree lives per thread batch, each search reroots it at the current position and
+    # keeps at most mcts_max_nodes nodes (see MCTS.set_root), so memory stays flat across games
     def handle_self_play_lifecycle(self):
         """
         PER THREAD FUNCTION
@@ -75,28 +77,39 @@ class Worker:
         According to the paper, each game of training (self-play) should start with a fresh MCTS tree.
         See: https://github.com/suragnair/alpha-zero-general/discussions/24
         """
-        go_game = GoGame(self.config['board_size'])
+        go_game = GoGame(self.config['board_size'], use_bitboard=self.config['use_bitboard'],
+                         enforce_superko=self.config['enforce_superko'],
+                         ladder_features=self.config['use_ladder_features'])
         neural_net = NNetWrapper(go_game, self.config)
         neural_net.load_checkpoint(CHECKPOINT_PATH, 'best.pth.tar')
-        mcts = MCTS(game=go_game, nnet=neural_net, is_self_play=True)
-        local_path, file_name = self.execute_self_play(go_game=go_game, neural_net=neural_net, mcts=mcts)
+        local_path, file_name = self.execute_self_play(go_game=go_game, neural_net=neural_net)
         self.connector.upload_self_play_examples(local_path, file_name)
         os.remove(local_path)
 
-    def execute_self_play(self, go_game, neural_net, mcts):
+    def execute_self_play(self, go_game, neural_net):
         """
         PER THREAD FUNCTION
-        Plays a single self play game for data collection
+        Plays num_games_per_distributed_batch self play games for data collection
         :param go_game:
         :param neural_net:
         :return:
         """
         train_examples_history = []
         iteration_train_examples = deque([], maxlen=self.config["max_length_of_queue"])
-        manager = SelfPlayManager(neural_net, mcts)
-        for eps in range(self.config["num_games_per_distributed_batch"]):
-            iteration_train_examples += manager.execute_game()
-            print("Self play game completed.")
+        if self.config["num_interleaved_games"] > 1:
+            # play the games num_interleaved_games at a time, batching the network evaluations
+            # of all the games in play
+            manager = InterleavedSelfPlayManager(go_game, neural_net)
+            iteration_train_examples += manager.execute_games(self.config["num_games_per_distributed_batch"])
+        else:
+            mcts = MCTS(game=go_game, nnet=neural_net, is_self_play=True)
+            manager = SelfPlayManager(go_game, neural_net, mcts)
+            for eps in range(self.config["num_games_per_distributed_batch"]):
+                iteration_train_examples += manager.execute_game()
+                print("Self play game completed.")
+        print(f"Score cache: {go_game.score_cache.stats()}")
+        if neural_net.eval_cache is not None:
+            print(f"Eval cache: {neural_net.eval_cache.stats()}")
 
         # save the generated train examples in their own file
         train_examples_history.append(iteration_train_examples)
@@ -131,7 +144,10 @@ class Worker:
         """
         Function at thread level
         """
-        go_game = GoGame(self.config['board_size'])
+        # one arena game shared by both networks, their searches and the arena itself
+        go_game = GoGame(self.config['board_size'], is_arena_game=True, use_bitboard=self.config['use_bitboard'],
+                         enforce_superko=self.config['enforce_superko'],
+                         ladder_features=self.config['use_ladder_features'])
         previous_net = NNetWrapper(game=go_game, config=self.config)
         previous_net.load_checkpoint(CHECKPOINT_PATH, 'previous_net.pth.tar')
         current_net = NNetWrapper(game=go_game, config=self.config)
@@ -142,13 +158,16 @@ class Worker:
         # prev_player = lambda x: np.argmax(previous_mcts.getActionProb(x, temp=0))
         # curr_player = lambda x: np.argmax(current_mcts.getActionProb(x, temp=0))
 
-        prev_player = lambda x, y, z, a, b, c, d: np.argmax(previous_mcts.getActionProb(x, y, z, a, b, c, d, temp=0))
-        curr_player = lambda x, y, z, a, b, c, d: np.argmax(current_mcts.getActionProb(x, y, z, a, b, c, d, temp=0))
+        prev_player = lambda x, y, z: np.argmax(previous_mcts.getActionProb(x, y, z, temp=0))
+        curr_player = lambda x, y, z: np.argmax(current_mcts.getActionProb(x, y, z, temp=0))
 
-        arena = ArenaManager(prev_player, curr_player, previous_mcts, current_mcts)
+        arena = ArenaManager(prev_player, curr_player, previous_mcts, current_mcts, go_game)
 
         prev_wins, current_wins, draws = arena.play_games(2)
         print("Arena two game batch completed.")
+        print(f"Score cache: {go_game.score_cache.stats()}")
+        if current_net.eval_cache is not None:
+            print(f"Eval cache: {current_net.eval_cache.stats()}")
 
         outcomes = {"current_wins": current_wins, "previous_wins": prev_wins, "ties": draws,
                     "games_played": prev_wins + current_wins + draws}
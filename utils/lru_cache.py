@@ -0,0 +1,48 @@
+from collections import OrderedDict
+
+'''
+LRUCache class.
+Bounded least recently used cache with hit/miss counters. Used for the
+process wide caches of position scores (go/score_cache.py) and network
+evaluations (neural_network/eval_cache.py). None cannot be cached, get
+returns it on a miss.
+'''
+
+
+class LRUCache:
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        """Return the cached value of key, None on a miss
+        """
+        value = self._entries.get(key)
+        if value is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        # max_size may have been lowered since the last put
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        self._entries.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses, "size": len(self._entries),
+                "hit_rate": self.hits / lookups if lookups else 0.0}
+
+    def __len__(self):
+        return len(self._entries)